@@ -15,45 +15,584 @@
 ## -------------------------------------------------------------------------- ##
 
 
-import ROOT
-import gc, os
+import gc, os, sys, time, traceback, pickle, json, csv
+import functools, contextlib, itertools, glob, hashlib
+from collections import deque
+import multiprocessing
 import numpy as np
-from array import array
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 
+try:
+    import resource
+except ImportError: # not available on Windows
+    resource = None
 
-from rich.console import Console
-console = Console()
+
+class _LazyROOT:
+    """
+    Stands in for the ROOT module until it is first used, so importing this module
+    (e.g. in worker processes that only touch arrays) does not pay for ROOT's startup.
+    """
+
+    def __getattr__(self, name):
+        import ROOT as module
+        globals()["ROOT"] = module # later lookups in this module go straight to ROOT
+        return getattr(module, name)
+
+ROOT = _LazyROOT()
+
+
+_console = None
+
+def _rich_console():
+    """Shared rich console, created on first use (plain output if rich is missing)."""
+    global _console
+    if _console is None:
+        try:
+            from rich.console import Console
+            _console = Console()
+        except ImportError:
+            _console = _PlainConsole()
+    return _console
+
+
+class _PlainConsole:
+    def print(self, *objects, style = None):
+        sys.stdout.write(" ".join(str(obj) for obj in objects) + "\n")
 
 
 tag = "[PlottingAssistant]"
-class Log:
 
-    def __init__(self, print_option = True):
-        self.print_option = print_option
-        self.msges = []
-        self.err_msges = []
 
-    def title(self, string = ""):
-        if self.print_option:
-            console.print(f"{tag} ######", string, "######", style="green")
+_style_applied = False
+
+def apply_global_style(force = False) -> None:
+    """
+    Global ROOT style used by every PlottingAssistant (ATLAS style, batch mode, palette).
+    Applied once per process; 'force' applies it again (e.g. after changing gStyle).
+    """
+    global _style_applied
+    if _style_applied and not force:
+        return
+    _style_applied = True
+
+    # Style settings 
+    ROOT.gROOT.SetStyle("ATLAS")
+    ROOT.gROOT.SetBatch(True) 
+    ROOT.gStyle.SetOptStat(0)
+    ROOT.gStyle.SetHatchesSpacing(1)
+    ROOT.gStyle.SetHatchesLineWidth(2)
+    ROOT.TGaxis.SetMaxDigits(4)
+
+    # Intial colors setting
+    ROOT.gStyle.SetPalette(ROOT.kBird) # kBird / kViridis/ kRainBow / kCubehelix
+    ROOT.gStyle.SetNumberContours(30)
+
+
+def enable_multithreading(n_threads = 0) -> None:
+    """
+    Turns on ROOT implicit multi-threading (0 = use all cores, None = leave as is).
+    ROOT only accepts this once per process, so later calls are ignored.
+    """
+    if n_threads is None or ROOT.IsImplicitMTEnabled():
+        return
+    ROOT.EnableImplicitMT(n_threads)
+
+
+def _buffer_view(buffer, size):
+    """Zero-copy float64 NumPy view over a C++ 'double*' returned by PyROOT."""
+    buffer.reshape((size,))
+    return np.frombuffer(buffer, dtype=np.float64, count=size)
+
+
+def _contents_view(hist):
+    """Bin contents of 'hist' (underflow and overflow included) as a zero-copy view."""
+    return _buffer_view(hist.GetArray(), hist.GetNcells())
+
+
+def _sumw2_view(hist):
+    """Sum of squared weights of 'hist' (underflow and overflow included) as a zero-copy view."""
+    if hist.GetSumw2N() == 0:
+        hist.Sumw2()
+    return _buffer_view(hist.GetSumw2().GetArray(), hist.GetNcells())
+
+
+def _bin_edges(hist):
+    """Bin edges of 'hist' (n_bins + 1 values) for uniform and variable binning."""
+    axis = hist.GetXaxis()
+    n_bins = axis.GetNbins()
+    if axis.IsVariableBinSize():
+        return np.array(_buffer_view(axis.GetXbins().GetArray(), n_bins + 1))
+    return np.linspace(axis.GetXmin(), axis.GetXmax(), n_bins + 1)
+
+
+def _empty_like(hist, name):
+    """Empty TH1D (with Sumw2) that has the binning and titles of 'hist'."""
+    axis = hist.GetXaxis()
+    title = f"{hist.GetTitle()};{axis.GetTitle()};{hist.GetYaxis().GetTitle()}"
+    if axis.IsVariableBinSize():
+        new = ROOT.TH1D(name, title, axis.GetNbins(), _bin_edges(hist))
+    else:
+        new = ROOT.TH1D(name, title, axis.GetNbins(), axis.GetXmin(), axis.GetXmax())
+    new.SetDirectory(0)
+    new.Sumw2()
+    return new
+
+
+def _binning_from_edges(edges):
+    """PlottingAssistant.binning_key()-style binning of an edge array (uniform if it is)."""
+    edges = np.asarray(edges, dtype=np.float64)
+    widths = np.diff(edges)
+    if np.allclose(widths, widths[0]):
+        return [len(widths), float(edges[0]), float(edges[-1])]
+    return {"edges" : edges.tolist()}
+
+
+def _binning_signature(hist) -> tuple:
+    """Cheap comparable description of the x binning of 'hist'."""
+    axis = hist.GetXaxis()
+    if axis.IsVariableBinSize():
+        return (axis.GetNbins(), tuple(_bin_edges(hist)))
+    return (axis.GetNbins(), axis.GetXmin(), axis.GetXmax())
+
+
+# Inputs summed sequentially per block by sum_histograms(); a constant, so that the
+# reduction does not depend on the number of workers
+_SUM_BLOCK_SIZE = 16
+
+
+def _weighted_block_sum(contents, sumw2, weights) -> tuple:
+    """Weighted sum of a block of content/sumw2 arrays (sumw2 scaled by weights^2)."""
+    weights = weights[:, None]
+    return (weights * np.stack(contents)).sum(axis=0), (weights**2 * np.stack(sumw2)).sum(axis=0)
+
+
+def _bin_array(obj, nbins):
+    """In-range bin values of a histogram, or an array/scalar broadcast to 'nbins'."""
+    if hasattr(obj, "GetArray"):
+        return _contents_view(obj)[1:nbins+1]
+    return np.broadcast_to(np.asarray(obj, dtype=np.float64), (nbins,))
+
+
+def _subdivide_edges(edges, factor):
+    """Edges with every bin of 'edges' split into 'factor' equal sub-bins."""
+    edges = np.asarray(edges, dtype=np.float64)
+    steps = np.arange(factor) / factor
+    fine = (edges[:-1, None] + np.diff(edges)[:, None] * steps).ravel()
+    return np.append(fine, edges[-1])
+
+
+def _coarse_indices(fine_edges, edges):
+    """Positions of 'edges' in 'fine_edges'; every coarse edge has to be a fine edge."""
+    edges = np.asarray(edges, dtype=np.float64)
+    if edges.ndim != 1 or edges.size < 2 or np.any(np.diff(edges) <= 0):
+        raise ValueError("edges must be a strictly increasing list of at least two edges")
+    idx = np.clip(np.searchsorted(fine_edges, edges), 1, len(fine_edges) - 1)
+    # nearest fine edge, so that floating-point noise in 'edges' does not matter
+    idx = np.where(np.abs(fine_edges[idx - 1] - edges) <= np.abs(fine_edges[idx] - edges), idx - 1, idx)
+    tolerance = 1e-9 * max(1.0, fine_edges[-1] - fine_edges[0])
+    off = np.abs(fine_edges[idx] - edges) > tolerance
+    if np.any(off):
+        raise ValueError(f"edges {edges[off].tolist()} do not coincide with edges of the fine histogram")
+    return idx
+
+
+def _merge_bins(array, idx):
+    """
+    Merges a per-bin array (underflow and overflow included) into coarse bins whose
+    edges are the fine edges at positions 'idx'. Fine bins outside the coarse range
+    go to the coarse underflow/overflow.
+    """
+    inner = array[1:-1]
+    merged = np.empty(len(idx) + 1)
+    merged[1:-1] = np.add.reduceat(inner[:idx[-1]], idx[:-1])
+    merged[0] = array[0] + inner[:idx[0]].sum()
+    merged[-1] = array[-1] + inner[idx[-1]:].sum()
+    return merged
+
+
+def _stat_merge_indices(contents, sumw2, target_rel_error):
+    """
+    Positions of the fine edges to keep so that every merged bin has a relative
+    MC-stat error sqrt(sumw2)/content <= target_rel_error. contents, sumw2: in-range
+    bins. Bins are merged from the high-x end, where the tails are sparse; a low-x
+    remainder that never reaches the target is merged into its neighbour.
+    """
+    n_bins = len(contents)
+    cum_contents = np.concatenate(([0.0], np.cumsum(contents[::-1])))
+    cum_sumw2 = np.concatenate(([0.0], np.cumsum(sumw2[::-1])))
+    target2 = target_rel_error**2
+
+    cuts, start = [0], 0
+    while start < n_bins:
+        group = cum_contents[start+1:] - cum_contents[start]
+        group_sumw2 = cum_sumw2[start+1:] - cum_sumw2[start]
+        ok = (group > 0) & (group_sumw2 <= target2 * group**2)
+        if not ok.any():
+            break
+        start += 1 + int(np.argmax(ok))
+        cuts.append(start)
+
+    if cuts[-1] != n_bins:
+        if len(cuts) > 1:
+            cuts[-1] = n_bins
+        else:
+            cuts.append(n_bins)
+    return n_bins - np.array(cuts[::-1])
+
+
+def _copy_style(source, target) -> None:
+    """Copies line, fill and marker attributes of one histogram to another."""
+    target.SetLineColor(source.GetLineColor())
+    target.SetLineStyle(source.GetLineStyle())
+    target.SetLineWidth(source.GetLineWidth())
+    target.SetFillColor(source.GetFillColor())
+    target.SetFillStyle(source.GetFillStyle())
+    target.SetMarkerColor(source.GetMarkerColor())
+    target.SetMarkerStyle(source.GetMarkerStyle())
+    target.SetMarkerSize(source.GetMarkerSize())
+
+
+# scalar keys of _histogram_statistics(), the columns of the statistics table
+_STATISTICS_COLUMNS = ("entries", "integral", "integral_in_range", "underflow", "underflow_error",
+                       "overflow", "overflow_error", "effective_entries", "max_rel_error", "n_empty_bins")
+
+
+def _histogram_statistics(contents, sumw2, entries, edges) -> dict:
+    """
+    Statistics of one histogram from its content/sumw2 arrays (underflow and overflow
+    included) in one vectorized pass. Relative errors are 0 for empty bins and the
+    effective number of entries is (sum w)^2 / sum w^2.
+    """
+    errors = np.sqrt(sumw2)
+    inner, inner_errors, inner_sumw2 = contents[1:-1], errors[1:-1], sumw2[1:-1]
+    filled = inner > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rel_errors = np.where(filled, inner_errors / inner, 0.0)
+        bin_n_eff = np.where(inner_sumw2 > 0, inner**2 / inner_sumw2, 0.0)
+    sum_w, sum_w2 = float(contents.sum()), float(sumw2.sum())
+
+    return {
+        "entries"           : float(entries),
+        "integral"          : sum_w,
+        "integral_in_range" : float(inner.sum()),
+        "underflow"         : float(contents[0]),
+        "underflow_error"   : float(errors[0]),
+        "overflow"          : float(contents[-1]),
+        "overflow_error"    : float(errors[-1]),
+        "effective_entries" : sum_w**2 / sum_w2 if sum_w2 > 0 else 0.0,
+        "max_rel_error"     : float(rel_errors.max()) if len(rel_errors) else 0.0,
+        "n_empty_bins"      : int(np.count_nonzero(~filled)),
+        "bins" : {
+            "low"               : edges[:-1],
+            "high"              : edges[1:],
+            "content"           : inner.copy(),
+            "error"             : inner_errors,
+            "rel_error"         : rel_errors,
+            "effective_entries" : bin_n_eff
+        }
+    }
+
+
+def _cut_sums(cells) -> tuple:
+    """
+    Sums of a per-bin array (underflow and overflow included) for every cut on the
+    n_bins + 1 bin edges, from one cumulative sum:
+        lower[k]     : x >= edges[k] (overflow included)
+        upper[k]     : x <  edges[k] (underflow included)
+        window[i, j] : edges[i] <= x < edges[j], nan for j <= i
+    """
+    cum = np.concatenate(([0.0], np.cumsum(cells)))
+    n_edges = len(cells) - 1
+    upper = cum[1:n_edges+1]
+    lower = cum[-1] - upper
+    window = upper[None, :] - upper[:, None]
+    window[np.tril_indices(n_edges)] = np.nan
+    return lower, upper, window
+
+
+def _asimov_z(s, b, rel_bkg_uncertainty = 0.0):
+    """
+    Median discovery significance (Asimov) of 's' signal over 'b' background events,
+    with an optional relative background uncertainty. Elementwise, nan where b <= 0.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if rel_bkg_uncertainty > 0:
+            var_b = (rel_bkg_uncertainty * b)**2
+            z2 = 2 * ((s + b) * np.log((s + b) * (b + var_b) / (b**2 + (s + b) * var_b))
+                      - b**2 / var_b * np.log1p(var_b * s / (b * (b + var_b))))
         else:
-            pass
+            z2 = 2 * ((s + b) * np.log1p(s / b) - s)
+        z = np.where(s > 0, np.sqrt(np.clip(z2, 0, None)), 0.0)
+    return np.where(b > 0, z, np.nan)
+
+
+def _significances(s, s_var, b, b_var, rel_bkg_uncertainty = 0.0) -> dict:
+    """
+    Yields, S/sqrt(B) and Asimov Z with their MC-stat uncertainties (s_var, b_var: summed
+    sumw2). The Asimov uncertainty is propagated with numerical derivatives.
+    """
+    s_err, b_err = np.sqrt(s_var), np.sqrt(b_var)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        s_over_sqrt_b = np.where(b > 0, s / np.sqrt(b), np.nan)
+        s_over_sqrt_b_err = np.where(b > 0, np.sqrt(s_var / b + s**2 * b_var / (4 * b**3)), np.nan)
+
+    z = _asimov_z(s, b, rel_bkg_uncertainty)
+    # central differences with a step of 1e-3 sigma, scaled back to a 1 sigma shift
+    h_s, h_b = 1e-3 * s_err, 1e-3 * b_err
+    dz_s = (_asimov_z(s + h_s, b, rel_bkg_uncertainty) - _asimov_z(s - h_s, b, rel_bkg_uncertainty)) * 500
+    dz_b = (_asimov_z(s, b + h_b, rel_bkg_uncertainty) - _asimov_z(s, b - h_b, rel_bkg_uncertainty)) * 500
+
+    return {
+        "s"                 : s,
+        "s_err"             : s_err,
+        "b"                 : b,
+        "b_err"             : b_err,
+        "s_over_sqrt_b"     : s_over_sqrt_b,
+        "s_over_sqrt_b_err" : s_over_sqrt_b_err,
+        "z_asimov"          : z,
+        "z_asimov_err"      : np.sqrt(dz_s**2 + dz_b**2)
+    }
+
+
+def _background_covariance(contents, sumw2, names,
+    per_proc_sys_fracs = None,
+    lumi_frac          = 0.0,
+    shape_variations   = None,
+    nuisances          = None ):
+    """
+    Full bin-by-bin covariance of the background total.
+    contents, sumw2: (n_processes, nbins) arrays of the in-range bins
+    names: histogram names, used when a nuisance is given as a dict
+    See PlottingAssistant.make_bkg_total_with_uncertainty() for the other arguments.
+    """
+    n_proc, nbins = contents.shape
+
+    # statistical variances (uncorrelated between bins)
+    var = sumw2.sum(axis=0)
+
+    # uncorrelated per-process fractional sys
+    if per_proc_sys_fracs:
+        n = min(len(per_proc_sys_fracs), n_proc)
+        fracs = np.array([_bin_array(f, nbins) for f in per_proc_sys_fracs[:n]])
+        var = var + ((fracs * contents[:n])**2).sum(axis=0)
+
+    # shape variations (up/down): envelope added in quadrature (uncorrelated across processes)
+    if shape_variations:
+        n = min(len(shape_variations), n_proc)
+        up = np.array([_bin_array(h_up, nbins) for h_up, _ in shape_variations[:n]])
+        down = np.array([_bin_array(h_down, nbins) for _, h_down in shape_variations[:n]])
+        delta = np.maximum(np.abs(up - contents[:n]), np.abs(contents[:n] - down))
+        var = var + (delta**2).sum(axis=0)
+
+    cov = np.diag(var)
+
+    # correlated lumi (fully correlated between bins)
+    if lumi_frac and lumi_frac > 0:
+        total = contents.sum(axis=0)
+        cov += lumi_frac**2 * np.outer(total, total)
+
+    # named nuisances: one signed shift per nuisance, summed over processes -> D^T D
+    if nuisances:
+        index = {name: i for i, name in enumerate(names)}
+        shifts = np.zeros((len(nuisances), nbins))
+        for k, variations in enumerate(nuisances.values()):
+            items = variations.items() if isinstance(variations, dict) else enumerate(variations)
+            for key, variation in items:
+                p = index[key] if isinstance(key, str) else key
+                if variation is None or p >= n_proc:
+                    continue
+                if isinstance(variation, (tuple, list)) and len(variation) == 2:
+                    shifts[k] += 0.5 * (_bin_array(variation[0], nbins) - _bin_array(variation[1], nbins))
+                else:
+                    shifts[k] += _bin_array(variation, nbins) * contents[p]
+        cov += shifts.T @ shifts
+
+    return cov
+
+
+_instance_ids = itertools.count()
+
+# Running per-stage aggregates over every assistant with profiling enabled
+# (see job_performance_report()); their size does not grow with the number of plots
+_job_profile = {"n_plots" : 0, "stages" : {}}
+
+
+def _peak_rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else 0
+
+
+def _current_rss_kb():
+    """Resident set size of this process now (Linux /proc, else the peak so far)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError):
+        return _peak_rss_kb()
+
+
+class _Stage:
+    """Times one stage (wall, CPU, RSS before and after) and records it on the assistant."""
+
+    def __init__(self, assistant, name):
+        self.assistant = assistant
+        self.name = name
+
+    def __enter__(self):
+        self.rss = _current_rss_kb()
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        return self
+
+    def __exit__(self, *exc):
+        wall = time.perf_counter() - self.wall
+        cpu = time.process_time() - self.cpu
+        rss = _current_rss_kb()
+        self.assistant._record_stage(self.name, wall, cpu, rss, rss - self.rss)
+        return False
+
+
+def _profiled(stage):
+    """Method decorator timing the call as 'stage' when profiling is enabled."""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if not self._profiling:
+                return method(self, *args, **kwargs)
+            with _Stage(self, stage):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _accumulate_stage(stages, record) -> None:
+    """Adds one stage record to the running aggregates in 'stages'."""
+    stage = stages.setdefault(record["stage"], {"calls": 0, "wall": 0.0, "cpu": 0.0, "max_wall": 0.0,
+                                                "max_rss_kb": 0, "rss_delta_kb": 0, "max_rss_delta_kb": 0})
+    stage["calls"] += 1
+    stage["wall"] += record["wall"]
+    stage["cpu"] += record["cpu"]
+    stage["max_wall"] = max(stage["max_wall"], record["wall"])
+    stage["max_rss_kb"] = max(stage["max_rss_kb"], record["rss_kb"])
+    stage["rss_delta_kb"] += record["rss_delta_kb"]
+    stage["max_rss_delta_kb"] = max(stage["max_rss_delta_kb"], record["rss_delta_kb"])
+
+
+def _finish_stages(stages) -> dict:
+    stages = {name : dict(stage) for name, stage in stages.items()}
+    for stage in stages.values():
+        stage["mean_wall"] = stage["wall"] / stage["calls"]
+    return stages
+
+
+def _summarize_stages(records) -> dict:
+    stages = {}
+    for record in records:
+        _accumulate_stage(stages, record)
+    return _finish_stages(stages)
+
+
+def job_performance_report() -> dict:
+    """Per-stage timing aggregated over every profiled assistant of this process."""
+    return {
+        "n_plots"     : _job_profile["n_plots"],
+        "peak_rss_kb" : _peak_rss_kb(),
+        "rss_kb"      : _current_rss_kb(),
+        "stages"      : _finish_stages(_job_profile["stages"])
+    }
+
+
+def dump_job_performance_report(path) -> None:
+    with open(path, "w") as f:
+        json.dump(job_performance_report(), f, indent=2)
 
-    def proc_title(self, string = ""):
-        if self.print_option:
-            console.print(f"{tag} >>>>", string, "<<<<", style="blue")
+
+def reset_job_profile() -> None:
+    _job_profile["n_plots"] = 0
+    _job_profile["stages"] = {}
+
+
+class Log:
+    """
+    Leveled logger. Messages may use lazy %-style arguments (log.msg("bin %d", i))
+    or be callables, so nothing is formatted when the level is disabled. The
+    message history is bounded and 'plain' mode writes straight to stdout instead
+    of going through rich (also set with PLOTTING_ASSISTANT_PLAIN_LOG=1).
+    Without an explicit level, PLOTTING_ASSISTANT_LOG_LEVEL (DEBUG, INFO, WARN,
+    OFF or a number) sets it, so it applies before the first message.
+    """
+
+    DEBUG = 10
+    INFO  = 20
+    WARN  = 30
+    OFF   = 100
+
+    def __init__(self, print_option = True, level = None, history_size = 1000, plain = None):
+        if level is None:
+            name = os.environ.get("PLOTTING_ASSISTANT_LOG_LEVEL", "").strip().upper()
+            if name.isdigit():
+                level = int(name)
+            elif name:
+                level = getattr(Log, name, None)
+        self.level = level if level is not None else (Log.INFO if print_option else Log.WARN)
+        if plain is None:
+            plain = os.environ.get("PLOTTING_ASSISTANT_PLAIN_LOG", "") not in ("", "0")
+        self.plain = plain
+        self.msges = deque(maxlen = history_size)
+        self.err_msges = deque(maxlen = history_size)
+
+    @property
+    def print_option(self) -> bool:
+        return self.level <= Log.INFO
+
+    @print_option.setter
+    def print_option(self, option : bool) -> None:
+        self.level = Log.INFO if option else Log.WARN
+
+    def set_history_size(self, history_size : int) -> None:
+        self.msges = deque(self.msges, maxlen = history_size)
+        self.err_msges = deque(self.err_msges, maxlen = history_size)
+
+    def enabled(self, level) -> bool:
+        return level >= self.level
+
+    @staticmethod
+    def _format(string, args):
+        if callable(string):
+            string = string()
+        return string % args if args else string
+
+    def _emit(self, prefix, string, style):
+        if self.plain:
+            sys.stdout.write(f"{prefix} {string}\n")
         else:
-            pass
+            _rich_console().print(prefix, string, style=style)
+
+    def title(self, string = "", *args):
+        if self.level <= Log.INFO:
+            self._emit(f"{tag} ######", f"{self._format(string, args)} ######", "green")
+
+    def proc_title(self, string = "", *args):
+        if self.level <= Log.INFO:
+            self._emit(f"{tag} >>>>", f"{self._format(string, args)} <<<<", "blue")
 
-    def msg(self, string = ""):
-        if self.print_option:
-            console.print(tag, string, style="white")
+    def msg(self, string = "", *args):
+        if self.level <= Log.INFO:
+            string = self._format(string, args)
+            self._emit(tag, string, "white")
             self.msges.append(string)
-        else:
-            pass    
-        
-    def err_msg(self, string = ""):
-        console.print(f"{tag} [WARN]", string, style="red")
+
+    def debug(self, string = "", *args):
+        if self.level <= Log.DEBUG:
+            string = self._format(string, args)
+            self._emit(tag, string, "dim")
+            self.msges.append(string)
+
+    def err_msg(self, string = "", *args):
+        string = self._format(string, args)
+        if self.level <= Log.WARN:
+            self._emit(f"{tag} [WARN]", string, "red")
         self.err_msges.append(string)
 
 
@@ -65,28 +604,37 @@ class PlottingAssistant:
                  units : str = "",
                  y_title : str = "Events",
                  n_bins : int = 25,
-                 x_range : list = None
+                 x_range : list = None,
+                 graphics_pool = None,
+                 bin_edges : list = None,
+                 log_level : int = None
                 ):
 
+        # Per-stage timing, off by default (see enable_profiling())
+        self._profiling = False
+        self.profile_records = []
+
         # Style settings 
-        ROOT.gROOT.SetStyle("ATLAS")
-        ROOT.gROOT.SetBatch(True) 
-        ROOT.gStyle.SetOptStat(0)
-        ROOT.gStyle.SetHatchesSpacing(1)
-        ROOT.gStyle.SetHatchesLineWidth(2)
-        ROOT.TGaxis.SetMaxDigits(4)
-
-        # Intial colors setting
-        ROOT.gStyle.SetPalette(ROOT.kBird) # kBird / kViridis/ kRainBow / kCubehelix
-        ROOT.gStyle.SetNumberContours(30)
+        apply_global_style()
         self.auto_chose_colors_ = True
 
         # logs
         self._show_hist_analysis = False
-        self.verbose_mode = True
-        self.log = Log(self.verbose_mode)
+        # 'log_level' (Log.DEBUG, Log.INFO, Log.WARN or Log.OFF) applies to the messages
+        # below already; see also PLOTTING_ASSISTANT_LOG_LEVEL
+        self.log = Log(True, level = log_level)
+        self.verbose_mode = self.log.print_option
+
+        # histogram titles
+        # 'bin_edges' books variable-width bins and overrides n_bins/x_range
+        self.bin_edges = None
+        if bin_edges is not None:
+            edges = np.asarray(bin_edges, dtype=np.float64)
+            if edges.ndim != 1 or edges.size < 2 or np.any(np.diff(edges) <= 0):
+                raise ValueError("bin_edges must be a strictly increasing list of at least two edges")
+            self.bin_edges = edges
+            x_range, n_bins = [edges[0], edges[-1]], int(edges.size - 1)
 
-        # histogram titles 
         if not (isinstance(x_range, (list, tuple)) and len(x_range) == 2 and x_range[0] < x_range[1]):
             raise TypeError("x_range must be a list or tuple [xmin, xmax] with xmin < xmax")
         self.x_min, self.x_max = float(x_range[0]), float(x_range[1])
@@ -94,72 +642,226 @@ class PlottingAssistant:
 
         if not isinstance(n_bins, int):
             raise TypeError(f"n_bins must be int, got {type(n_bins)}")
-        
+
         self.n_bins = n_bins
         self.units = units
+        self._axis_titles = (x_title, y_title)
         self.x_title = f"{x_title} [{self.units}]" if self.units != "" else f"{x_title}"
-        self.bin_width = round((self.x_max -self.x_min)/self.n_bins, 1)
-        self.y_title = f"{y_title} / {self.bin_width} {self.units}" if self.units != "" else f"{y_title} / {self.bin_width}"
+        if self.bin_edges is not None:
+            self.bin_width = None
+            self.y_title = f"{y_title} / bin"
+        else:
+            self.bin_width = round((self.x_max -self.x_min)/self.n_bins, 1)
+            self.y_title = f"{y_title} / {self.bin_width} {self.units}" if self.units != "" else f"{y_title} / {self.bin_width}"
 
         # class
         self.histograms = []
+        self._hist_info = {}    # id(hist) -> {"role", "legend", "weight"}
         self.single_histograms = []
         self.stacked_histograms = []
         self.y_log = False
         self.y_peak = 0
         self.read_histograms_from_root = False
-        unique = str(id(self))
-        self.log.title(f"Plotting Assisting Activated [Unique ID: {unique}].")
-        self.log.msg(f"X Tile: '{self.x_title}'")
-        self.log.msg(f"Y Title: '{self.y_title}'")
-        self.log.msg(f"Range of all histogram = [{self.x_min}, {self.x_max}] {self.units}, with {self.n_bins} bins.\n")
+        # a counter, not id(self): ids are reused and ROOT replaces canvases with the same name
+        unique = str(next(_instance_ids))
+        self._unique = unique
+        self.plot_name = ""     # set by draw_plot()
+        self._hist_ids = itertools.count()
+        self.log.title("Plotting Assisting Activated [Unique ID: %s].", unique)
+        self.log.msg("X Tile: '%s'", self.x_title)
+        self.log.msg("Y Title: '%s'", self.y_title)
+        self.log.msg("Range of all histogram = [%s, %s] %s, with %d bins.\n", self.x_min, self.x_max, self.units, self.n_bins)
 
         # Initial Canvas Settings
-        self.canvas = ROOT.TCanvas(
-            f"Canvas_{unique}",
-            f"Canvas_{unique}"
-        )
-        self.canvas.SetCanvasSize(800, 600)
+        # The canvas, legends, stack and label are created on first use (see the
+        # properties below), so assistants that never draw do not build them.
+        # The canvas and legends come from 'graphics_pool' (a GraphicsPool) when given
+        # and go back to it in clean_memory()
+        self._pool = graphics_pool
+        self._canvas = None
+        self._canvas_size = (800, 600)
         self.save_formats = ["pdf"]
+        self.export_workers = 1
+        self.skip_up_to_date = False
+        self.input_files = []
+        self.histogram_cache = None
+        self.chunk_size = 1_000_000
+        self.uncertainties = {}     # see set_uncertainties()
 
         # Initial Legends Settings
-        self.legend_bkg = ROOT.TLegend(0.58, 0.65, 0.95, 0.90)
-        self.legend_bkg.SetName(f"legend_sig_{unique}")
-        self.legend_bkg.SetNColumns(2)
-        self.legend_bkg.SetBorderSize(0)
-        self.legend_bkg.SetFillStyle(0)
-        self.legend_bkg.SetTextSize(0.035)
+        self._legend_bkg = None
         self.num_of_legends_bkg = 0
         self.bkg_histograms_legends = []
 
-        self.legend_sig = ROOT.TLegend(0.58, 0.55, 0.90, 0.65)
-        self.legend_sig.SetName(f"legend_sig_{unique}")
-        self.legend_sig.SetNColumns(1)
-        self.legend_sig.SetBorderSize(0)
-        self.legend_sig.SetFillStyle(0)
-        self.legend_sig.SetTextSize(0.034)
+        self._legend_sig = None
+        self._legend_sig_layout = {"x1" : 0.58, "y1" : 0.55, "x2" : 0.90, "y2" : 0.65, "text_size" : 0.034, "ncols" : 1}
         self.num_of_legends_sig = 0
         self.sig_histograms_legends = []
 
         # Inital Stacked Histograms settings
         # Only used if is_background = True
-        self.stack = ROOT.THStack(
-            f"Stack_{unique}",
-            f"Stack_{unique}; {self.x_title}; {self.y_title}"
-        )
+        self._stack = None
         # The order is addiving histograms with less events
         # into the stacked histogram first
         self._stack_in_order = True
         self.stacked_histograms_height = 0
 
+        # id(hist) -> (contents, sumw2) read-only views of an attached HistogramStore,
+        # copied into the TH1D only when the plot is drawn or saved
+        self._store_views = {}
+
+        # Running bin-wise sum of the backgrounds (underflow/overflow included),
+        # updated in O(bins) per append and reused for the total background
+        self._bkg_sum = None
+        self._bkg_sumw2 = None
+        self._bkg_entries = 0
+
+        # Ordered stack, background legend entries and uncertainty band built by
+        # the first draw_plot() and reused until a histogram is appended
+        self._render_cache = None
+
         # Initial Labels settings
-        self.label = ROOT.TLatex()
-        self.label.SetTextFont(42)
-        self.label.SetNDC()
+        self._label = None
         self.labels = []
     
+    def _new_legend(self, x1, y1, x2, y2):
+        if self._pool is not None:
+            return self._pool.acquire_legend(x1, y1, x2, y2)
+        return ROOT.TLegend(x1, y1, x2, y2)
+
+    @property
+    def canvas(self):
+        """The TCanvas, created (or taken from the graphics pool) on first use."""
+        if self._canvas is None:
+            if self._pool is not None:
+                canvas = self._pool.acquire_canvas()
+            else:
+                canvas = ROOT.TCanvas(
+                    f"Canvas_{self._unique}",
+                    f"Canvas_{self._unique}"
+                )
+            canvas.SetCanvasSize(*self._canvas_size)
+            canvas.SetLogy(self.y_log)
+            self._canvas = canvas
+        return self._canvas
+
+    @canvas.setter
+    def canvas(self, canvas):
+        self._canvas = canvas
+
+    @property
+    def legend_bkg(self):
+        if self._legend_bkg is None:
+            legend = self._new_legend(0.58, 0.65, 0.95, 0.90)
+            legend.SetName(f"legend_bkg_{self._unique}")
+            legend.SetNColumns(2)
+            legend.SetBorderSize(0)
+            legend.SetFillStyle(0)
+            legend.SetTextSize(0.035)
+            self._legend_bkg = legend
+        return self._legend_bkg
+
+    @legend_bkg.setter
+    def legend_bkg(self, legend):
+        self._legend_bkg = legend
+
+    @property
+    def legend_sig(self):
+        if self._legend_sig is None:
+            layout = self._legend_sig_layout
+            legend = self._new_legend(layout["x1"], layout["y1"], layout["x2"], layout["y2"])
+            legend.SetName(f"legend_sig_{self._unique}")
+            legend.SetNColumns(layout["ncols"])
+            legend.SetBorderSize(0)
+            legend.SetFillStyle(0)
+            legend.SetTextSize(layout["text_size"])
+            self._legend_sig = legend
+        return self._legend_sig
+
+    @legend_sig.setter
+    def legend_sig(self, legend):
+        self._legend_sig = legend
+
+    @property
+    def stack(self):
+        if self._stack is None:
+            self._stack = ROOT.THStack(
+                f"Stack_{self._unique}",
+                f"Stack_{self._unique}; {self.x_title}; {self.y_title}"
+            )
+        return self._stack
+
+    @stack.setter
+    def stack(self, stack):
+        self._stack = stack
+
+    @property
+    def label(self):
+        if self._label is None:
+            self._label = ROOT.TLatex()
+            self._label.SetTextFont(42)
+            self._label.SetNDC()
+        return self._label
+
+    @label.setter
+    def label(self, label):
+        self._label = label
+
     def set_verbose_mode(self, option : bool) -> None:
         self.verbose_mode = option
+        self.log.print_option = option
+
+    def set_logging(self, level = None, plain = None, history_size = None) -> None:
+        """
+        level:        Log.DEBUG, Log.INFO, Log.WARN or Log.OFF
+        plain:        plain stdout output instead of rich (faster for batch jobs)
+        history_size: number of messages kept in memory
+        """
+        if level is not None:
+            self.log.level = level
+            self.verbose_mode = level <= Log.INFO
+        if plain is not None:
+            self.log.plain = plain
+        if history_size is not None:
+            self.log.set_history_size(history_size)
+
+    def enable_profiling(self, option : bool = True) -> None:
+        """
+        Records wall time, CPU time and the resident memory after each stage and
+        its change during the stage (booking, filling, append, stacking, background
+        uncertainty, drawing, saving per format).
+        Stages nest: 'draw_plot' includes 'stack', 'bkg_uncertainty' and 'save.<format>'.
+        """
+        self._profiling = option
+
+    def _profile(self, stage):
+        return _Stage(self, stage) if self._profiling else contextlib.nullcontext()
+
+    def _record_stage(self, stage, wall, cpu, rss_kb = None, rss_delta_kb = 0) -> None:
+        record = {
+            "plot"         : self.plot_name or f"PlottingAssistant_{self._unique}",
+            "stage"        : stage,
+            "wall"         : wall,
+            "cpu"          : cpu,
+            "rss_kb"       : _current_rss_kb() if rss_kb is None else rss_kb,
+            "rss_delta_kb" : rss_delta_kb
+        }
+        if self.profile_records == []:
+            _job_profile["n_plots"] += 1
+        self.profile_records.append(record)
+        _accumulate_stage(_job_profile["stages"], record)
+
+    def performance_report(self) -> dict:
+        """Per-stage summary and raw records of this assistant."""
+        return {
+            "plot"    : self.plot_name or f"PlottingAssistant_{self._unique}",
+            "stages"  : _summarize_stages(self.profile_records),
+            "records" : list(self.profile_records)
+        }
+
+    def dump_performance_report(self, path) -> None:
+        with open(path, "w") as f:
+            json.dump(self.performance_report(), f, indent=2)
 
     def show_hist_analysis(self, option : bool) -> None:
         self._show_hist_analysis = option
@@ -169,6 +871,7 @@ class PlottingAssistant:
     
     def stack_in_order(self, option : bool) -> None:
         self._stack_in_order = option
+        self._render_cache = None
         
     def add_label(self, x1 = 0.20, y1 = 0.80, label = "", text_size = 0.045) -> None:
         self.labels.append({
@@ -180,26 +883,58 @@ class PlottingAssistant:
         
     def set_canvas_size(self, width, height) -> None:
         try:
-            self.canvas.SetCanvasSize(width, height)
-            self.log.msg(f"Canvas size was set to {width} * {height}")
+            self._canvas_size = (width, height)
+            if self._canvas is not None:
+                self._canvas.SetCanvasSize(width, height)
+            self.log.msg("Canvas size was set to %s * %s", width, height)
         except Exception as e:
             self.log.err_msg(f"Could not set canvas size to {width} * {height} due to the error {e}")
 
+    def set_export_options(self, n_workers = None, skip_up_to_date = None, inputs = None) -> None:
+        """
+        n_workers:       number of processes exporting the formats of one plot concurrently (1 = serial)
+        skip_up_to_date: skip formats whose output file is newer than all input files
+        inputs:          extra input files for the up-to-date check (files filled through
+                         fill_from_file() / FillPlan are recorded automatically)
+        """
+        if n_workers is not None:
+            self.export_workers = n_workers
+        if skip_up_to_date is not None:
+            self.skip_up_to_date = skip_up_to_date
+        if inputs is not None:
+            self.input_files.extend([inputs] if isinstance(inputs, str) else inputs)
+
+    def set_uncertainties(self, **uncertainties) -> None:
+        """
+        Uncertainties of the drawn background band and of compute_plot_data(), with
+        the arguments of make_bkg_total_with_uncertainty(): per_proc_sys_fracs,
+        lumi_frac, shape_variations and nuisances. Replaces the previous setting.
+        """
+        unknown = set(uncertainties) - {"per_proc_sys_fracs", "lumi_frac", "shape_variations", "nuisances"}
+        if unknown:
+            raise TypeError(f"Unknown uncertainty argument(s): {', '.join(sorted(unknown))}")
+        self.uncertainties = dict(uncertainties)
+        self._render_cache = None
+
     def set_legend_ncols(self,n) -> None:
         try:
-            self.legend_sig.SetNColumns(n)
-            self.log.msg(f"Legend number of columns was set to {n}")
+            self._legend_sig_layout["ncols"] = n
+            if self._legend_sig is not None:
+                self._legend_sig.SetNColumns(n)
+            self.log.msg("Legend number of columns was set to %s", n)
         except Exception as e:
             self.log.err_msg(f"Could not set legend NColumns (={n}) due to the error {e}")
 
     def set_legend_position(self, x1 = 0.63, y1 = 0.60, x2 = 0.92, y2 = 0.90, text_size = 0.025) -> None:
 
         try:
-            self.legend_sig.SetX1(x1)  # Left coordinate
-            self.legend_sig.SetY1(y1)  # Bottom coordinate  
-            self.legend_sig.SetX2(x2)  # Right coordinate
-            self.legend_sig.SetY2(y2)  # Top coordinate
-            self.legend_sig.SetTextSize(text_size)
+            self._legend_sig_layout.update({"x1" : x1, "y1" : y1, "x2" : x2, "y2" : y2, "text_size" : text_size})
+            if self._legend_sig is not None:
+                self._legend_sig.SetX1(x1)  # Left coordinate
+                self._legend_sig.SetY1(y1)  # Bottom coordinate  
+                self._legend_sig.SetX2(x2)  # Right coordinate
+                self._legend_sig.SetY2(y2)  # Top coordinate
+                self._legend_sig.SetTextSize(text_size)
             self.log.msg("Legend positon and size set successfully.")
         except Exception as e:
             self.log.err_msg(f"Could not set the legend position due to the error {e}")
@@ -210,30 +945,54 @@ class PlottingAssistant:
         """
         pass
     
-    def sum_histograms(self, histograms: list = []) -> "ROOT.THID" :
+    def sum_histograms(self, histograms: list = [], weights = None, n_workers = 1) -> "ROOT.TH1D" :
         """
         Sums a list of TH1D histograms and returns a single TH1D summed histogram.
-        Assumes all histograms have the same binning.
+        weights:   optional per-histogram weights (e.g. cross-section weights of
+                   pT-hat / HT slices); sumw2 is scaled by the squared weights
+        n_workers: threads summing the inputs in blocks of _SUM_BLOCK_SIZE; the blocks
+                   and their pairwise merge depend only on the input order, so the
+                   result is bit-identical for any n_workers
+        The sum runs on the contents/sumw2 arrays, after checking once that every
+        histogram has the binning of the first one.
         """
         if not histograms or len(histograms) == 0:
             self.log.err_msg("No histograms provided to sum.")
             return None
 
         try:
-            # Use binning from the first histogram
             first_hist = histograms[0]
-            n_bins  = first_hist.GetNbinsX()
-            x_min   = first_hist.GetXaxis().GetXmin()
-            x_max   = first_hist.GetXaxis().GetXmax()
+            signature = _binning_signature(first_hist)
+            for hist in histograms[1:]:
+                if _binning_signature(hist) != signature:
+                    raise ValueError(f"'{hist.GetName()}' has a different binning than '{first_hist.GetName()}'")
+
+            weights = np.ones(len(histograms)) if weights is None else np.asarray(weights, dtype=np.float64)
+            if len(weights) != len(histograms):
+                raise ValueError(f"Got {len(weights)} weights for {len(histograms)} histograms")
+
+            arrays = [self._raw_arrays(hist) for hist in histograms]
+            contents = [c for c, _ in arrays]
+            sumw2 = [w2 for _, w2 in arrays]
+
+            # fixed-size blocks of inputs, shared among the workers, merged pairwise
+            blocks = [(contents[lo:lo + _SUM_BLOCK_SIZE], sumw2[lo:lo + _SUM_BLOCK_SIZE], weights[lo:lo + _SUM_BLOCK_SIZE])
+                      for lo in range(0, len(histograms), _SUM_BLOCK_SIZE)]
+            n_threads = max(1, min(n_workers, len(blocks)))
+            if n_threads > 1:
+                with ThreadPoolExecutor(max_workers = n_threads) as pool:
+                    partial = list(pool.map(lambda block: _weighted_block_sum(*block), blocks))
+            else:
+                partial = [_weighted_block_sum(*block) for block in blocks]
+
             summed_hist_name  = f"{first_hist.GetName()}_summed"
-            summed_hist_title = f"{summed_hist_name};{first_hist.GetXaxis().GetTitle()};{first_hist.GetYaxis().GetTitle()}"
-            summed_hist = ROOT.TH1D(summed_hist_name, summed_hist_title, n_bins, x_min, x_max)
+            summed_hist = _empty_like(first_hist, summed_hist_name)
+            _contents_view(summed_hist)[:] = _tree_reduce([part[0] for part in partial])
+            _sumw2_view(summed_hist)[:] = _tree_reduce([part[1] for part in partial])
+            summed_hist.ResetStats()
+            summed_hist.SetEntries(sum(hist.GetEntries() for hist in histograms))
 
-            # Sum all histograms (histograms can simply be added using Add)
-            for hist in histograms:
-                summed_hist.Add(hist)
-            
-            self.log.msg("Histograms summed successfully.")
+            self.log.msg("%d histograms summed successfully.", len(histograms))
         
         except Exception as e:
             self.log.err_msg(f"Error while summing histograms: {e}")
@@ -241,17 +1000,66 @@ class PlottingAssistant:
 
         return summed_hist
 
+    def hist_title(self) -> str:
+        return f"hist_title; {self.x_title}; {self.y_title}"
+
+    def _default_hist_name(self) -> str:
+        """A histogram name unique in the process, for fills without a 'hist_name'."""
+        return f"h_{self._unique}_{next(self._hist_ids)}"
+
+    def histogram_model(self, hist_name = ""):
+        """RDataFrame model of a histogram with the booked binning and titles."""
+        if self.bin_edges is not None:
+            return ROOT.RDF.TH1DModel(hist_name, self.hist_title(), self.n_bins, self.bin_edges)
+        return ROOT.RDF.TH1DModel(hist_name, self.hist_title(), self.n_bins, self.x_min, self.x_max)
+
+    def binning_key(self):
+        """
+        JSON-serialisable description of the booked binning (used in cache keys):
+        [n_bins, x_min, x_max] for uniform bins, {"edges": [...]} for variable bins.
+        """
+        if self.bin_edges is not None:
+            return {"edges" : self.bin_edges.tolist()}
+        return [self.n_bins, self.x_min, self.x_max]
+
+    def bin_edges_array(self):
+        """Edges of the booked binning (n_bins + 1 values)."""
+        if self.bin_edges is not None:
+            return self.bin_edges.copy()
+        return np.linspace(self.x_min, self.x_max, self.n_bins + 1)
+
+    def set_histogram_cache(self, cache) -> None:
+        """Uses a HistogramCache for fill_from_file() / FillPlan fills of this assistant."""
+        self.histogram_cache = cache
+
+    def _new_histogram(self, hist_name):
+        hist = _th1d_from_binning(hist_name, self.hist_title(), self.binning_key())
+        # owned by Python (not by whatever TFile is open), freed with its last reference
+        hist.SetDirectory(0)
+        return hist
+
+    def _histogram_from_arrays(self, hist_name, contents, sumw2, entries):
+        """Booked-binning TH1D with the given contents/sumw2 (underflow and overflow included)."""
+        hist = self._new_histogram(hist_name)
+        hist.Sumw2()
+        _contents_view(hist)[:] = contents
+        _sumw2_view(hist)[:] = sumw2
+        hist.ResetStats()
+        hist.SetEntries(entries)
+        return hist
+
+    @_profiled("book")
     def book_histogram(self, hist_name = ""):
-        self.log.proc_title(f"Booking Histogram '{hist_name}'")
+        self.log.proc_title("Booking Histogram '%s'", hist_name)
         try:
-            hist_title = f"hist_title; {self.x_title}; {self.y_title}"
-            hist = ROOT.TH1D(hist_name, hist_title, self.n_bins, self.x_min, self.x_max)
-            self.log.msg(f"The histogram was booked successfully.")
+            hist = self._new_histogram(hist_name)
+            self.log.msg("The histogram was booked successfully.")
         except Exception as e:
             self.log.err_msg(f"Could not book the histogram due to the error: {e}")
 
         return hist
 
+    @_profiled("append")
     def append_histogram(self, hist,
         weight        = 1.0, 
         is_signal     = False,
@@ -260,30 +1068,34 @@ class PlottingAssistant:
         show_legend   = False, 
         legend_name   = "" ) -> None:
 
-        name = hist.GetName()
+        # the per-histogram info (role, legend, weight) is keyed by the object
+        if id(hist) in self._hist_info:
+            raise ValueError(f"Histogram '{hist.GetName()}' was already appended; append a Clone() to use it twice")
+        self._render_cache = None
+        self._hist_info[id(hist)] = {
+            "role"   : "background" if is_background else ("signal" if is_signal else "data"),
+            "legend" : legend_name if show_legend else "",
+            "weight" : float(weight)
+        }
 
         # Dealing with historgam:
-        hist.Scale(weight)
-        # hist.Sumw2() # optional
-
-        hist_height = hist.GetMaximum()
+        # The weight is not applied to 'hist' (which stays untouched and can be
+        # appended elsewhere); it is applied when stacking, summing and drawing.
+        contents, _ = self._weighted_arrays(hist)
+        hist_height = float(contents[1:-1].max()) if len(contents) > 2 else 0.0
 
         # If hist is background "auto" stack
         if is_background == True:
             try:
+                self._add_to_bkg_sum(hist)
                 self.stacked_histograms.append(hist)
-                self.log.msg(f"This histogram was deticated for a 'Background' process.")
-
-                # Don't add to stack here when stack_in_order=True
-                if not self._stack_in_order:
-                    self.stack.Add(hist)
-                    self.log.msg("The histogram was stacked successfully.")
-                else:    
-                    self.log.err_msg(f"Background histogram queued for stacking.")
-                    self.log.err_msg(f"Ordered stacking process will take place while plotting.")
+                self.log.msg("This histogram was deticated for a 'Background' process.")
+
+                # the stack is built while plotting (see _build_stack())
+                self.log.msg("Background histogram queued for stacking.")
                 
-                # calculate total stacked histograms height
-                self.stacked_histograms_height += hist_height
+                # exact height of the stacked histograms
+                self.stacked_histograms_height = float(self._bkg_sum[1:-1].max())
 
                 # directly add the legend
                 if show_legend == True:
@@ -296,33 +1108,33 @@ class PlottingAssistant:
                         })
 
                         self.num_of_legends_bkg += 1
-                        self.log.msg(f"Legend of the historgam was add successfully.")
+                        self.log.msg("Legend of the historgam was add successfully.")
                     except Exception as e:
-                        self.log.err_msg(f"Could not draw legend of the histogram. Returning the error: {e}")
+                        self.log.err_msg("Could not draw legend of the histogram. Returning the error: %s", e)
                 
             except Exception as e:
-                self.log.err_msg(f"Could not append the histogram. Returning the error: {e}")
+                self.log.err_msg("Could not append the histogram. Returning the error: %s", e)
         else:
             try:
                 _type = "Signal" if is_signal == True else "Data"
                 self.single_histograms.append(hist)
-                self.log.msg(f"This histogram was deticated for a '{_type}' process.")
+                self.log.msg("This histogram was deticated for a '%s' process.", _type)
             except Exception as e:
-                self.log.err_msg(f"Could not append the histogram. Returning the error: {e}")
+                self.log.err_msg("Could not append the histogram. Returning the error: %s", e)
             
             # directly add the legend
             if show_legend == True:
                 try:
-                    self.legend_sig.AddEntry(hist, legend_name, "l")
-
-                    # self.sig_histograms_legends.append({
-                    #         hist : legend_name
-                    # })
+                    # added to the legend when the plot is first drawn
+                    self.sig_histograms_legends.append({
+                        "hist" : hist,
+                        "legend" : legend_name
+                    })
                     
                     self.num_of_legends_sig += 1
-                    self.log.msg(f"Legend of the historgam was add successfully.")
+                    self.log.msg("Legend of the historgam was add successfully.")
                 except Exception as e:
-                    self.log.err_msg(f"Could not draw legend of the histogram. Returning the error: {e}")
+                    self.log.err_msg("Could not draw legend of the histogram. Returning the error: %s", e)
         
         # # "Auto" fill the legends
         # # Can be used if you want to inlucde a third legend
@@ -337,71 +1149,551 @@ class PlottingAssistant:
         #         self.log.err_msg(f"Could not draw legend of the histogram. Returning the error: {e}")
         
         ## Getting maximum
-        self.log.msg(f"Highest point of this histogram: {hist_height} (events)")
-        self.log.msg(f"Total highest point stacked histograms: {self.stacked_histograms_height} (events)")  
+        self.log.msg("Highest point of this histogram: %s (events)", hist_height)
+        self.log.msg("Total highest point stacked histograms: %s (events)", self.stacked_histograms_height)
         try:
-            try:
-                y_peak_stack = self.stack.GetMaximum()
-            except Exception as e:
-                y_peak_stack = self.stacked_histograms_height
-
-            y_peak = max(y_peak_stack, hist_height)
+            y_peak = max(self.stacked_histograms_height, hist_height)
             if y_peak > self.y_peak:
                 self.y_peak = y_peak
             
-            self.log.msg(f"Current highest peak among all appeneded histograms is {self.y_peak}.")
+            self.log.msg("Current highest peak among all appeneded histograms is %s.", self.y_peak)
         except Exception as e:
-            self.log.err_msg(f"Could not run y maxima calculations due to the error: {e}")
+            self.log.err_msg("Could not run y maxima calculations due to the error: %s", e)
 
         ## Priniting out some data about the histogram
-        if self._show_hist_analysis:
+        if self._show_hist_analysis and self.log.enabled(Log.INFO):
             self.analyze_histogram(hist)
 
         self.histograms.append(hist)
     
     
-    def analyze_histogram(self, hist) -> None:
+    def get_histogram(self, name):
+        """Returns the appended histogram called 'name' (or None)."""
+        for hist in self.histograms:
+            if hist.GetName() == name:
+                return hist
+        return None
+
+    def fill_from_arrays(self, hist, values, weights = None) -> None:
+        """
+        Fills 'hist' from NumPy arrays of values (and optional per-entry weights)
+        with a single TH1::FillN call instead of one Fill call per entry.
+        """
+        values = np.ascontiguousarray(values, dtype=np.float64).ravel()
+        if weights is None:
+            hist.FillN(len(values), values, ROOT.nullptr)
+        else:
+            weights = np.ascontiguousarray(weights, dtype=np.float64).ravel()
+            if len(weights) != len(values):
+                raise ValueError(f"values and weights must have the same length, got {len(values)} and {len(weights)}")
+            hist.FillN(len(values), values, weights)
 
-        """Complete analysis of a histogram"""
-        
-        nbins = self.n_bins
-              
-        # Underflow/Overflow
-        underflow = hist.GetBinContent(0)
-        underflow_error = hist.GetBinError(0)
-        overflow = hist.GetBinContent(nbins + 1)
-        overflow_error = hist.GetBinError(nbins + 1)
-        
+    def histogram_arrays(self, hist) -> tuple:
+        """
+        Returns (contents, sumw2) of a histogram (or of the appended histogram with
+        that name) as zero-copy NumPy views over the TH1D buffers. Both arrays have
+        n_bins + 2 entries: index 0 is the underflow, index -1 the overflow.
+        The append weight is not included (see histogram_weight()).
+        The views stay valid as long as the histogram lives and is not rebinned.
+        For histograms attached from a HistogramStore they are read-only views
+        of the store.
+        """
+        if isinstance(hist, str):
+            name = hist
+            hist = self.get_histogram(name)
+            if hist is None:
+                raise KeyError(f"No appended histogram called '{name}'")
+
+        return self._raw_arrays(hist)
+
+    def _raw_arrays(self, hist) -> tuple:
+        """(contents, sumw2) views: of the attached store if any, else of the TH1D buffers."""
+        views = self._store_views.get(id(hist))
+        if views is not None:
+            return views
+        return _contents_view(hist), _sumw2_view(hist)
+
+    def histogram_weight(self, hist) -> float:
+        """Weight 'hist' was appended with (1.0 if it was not appended)."""
+        return self._hist_info.get(id(hist), {}).get("weight", 1.0)
+
+    def _weighted_arrays(self, hist) -> tuple:
+        """
+        (contents, sumw2) with the append weight applied, underflow/overflow included.
+        For weight 1 these are the zero-copy views themselves: do not modify them.
+        """
+        weight = self.histogram_weight(hist)
+        contents, sumw2 = self._raw_arrays(hist)
+        if weight == 1.0:
+            return contents, sumw2
+        return weight * contents, weight**2 * sumw2
+
+    def _scaled(self, hist):
+        """'hist' with its append weight applied: 'hist' itself for weight 1, else a scaled clone."""
+        weight = self.histogram_weight(hist)
+        if weight == 1.0:
+            return hist
+        scaled = hist.Clone(hist.GetName())
+        scaled.SetDirectory(0)
+        scaled.Scale(weight)
+        return scaled
+
+    def _add_to_bkg_sum(self, hist) -> None:
+        contents, sumw2 = self._weighted_arrays(hist)
+        if self._bkg_sum is None:
+            self._bkg_sum = np.array(contents)
+            self._bkg_sumw2 = np.array(sumw2)
+        elif len(contents) != len(self._bkg_sum):
+            raise ValueError(f"'{hist.GetName()}' has {len(contents) - 2} bins, the stacked backgrounds have {len(self._bkg_sum) - 2}")
+        else:
+            self._bkg_sum += contents
+            self._bkg_sumw2 += sumw2
+        self._bkg_entries += hist.GetEntries()
+
+    def _bkg_total_hist(self, name):
+        """New TH1D holding the summed backgrounds, built from the running sum arrays."""
+        bkg_total = _empty_like(self.stacked_histograms[0], name)
+        _contents_view(bkg_total)[:] = self._bkg_sum
+        _sumw2_view(bkg_total)[:] = self._bkg_sumw2
+        bkg_total.ResetStats()
+        bkg_total.SetEntries(self._bkg_entries)
+        return bkg_total
+
+    def export_store(self, path, histograms = None):
+        """
+        Writes the appended histograms (or 'histograms') with their role, append weight
+        and legend to a memory-mapped HistogramStore at 'path' and returns it opened.
+        """
+        histograms = self.histograms if histograms is None else histograms
+        entries = []
+        for hist in histograms:
+            info = self._hist_info.get(id(hist), {})
+            contents, sumw2 = self._raw_arrays(hist)
+            entries.append({
+                "name"     : hist.GetName(),
+                "title"    : f"{hist.GetTitle()};{hist.GetXaxis().GetTitle()};{hist.GetYaxis().GetTitle()}",
+                "role"     : info.get("role", ""),
+                "weight"   : info.get("weight", 1.0),
+                "legend"   : info.get("legend", ""),
+                "entries"  : hist.GetEntries(),
+                "contents" : contents,
+                "sumw2"    : sumw2,
+                "edges"    : _bin_edges(hist)
+            })
+        HistogramStore.write(path, entries)
+        self.log.msg("%d histogram(s) were exported to the store '%s'.", len(entries), path)
+        return HistogramStore(path)
+
+    def attach_store(self, store, names = None) -> list:
+        """
+        Appends the histograms of a HistogramStore (or the path of one) with their
+        stored role, weight and legend. Their arrays are not copied: totals,
+        uncertainties, statistics, scans and plot data read the memory-mapped views.
+        The TH1D buffers are filled only when the plot is drawn or saved.
+        Raises ValueError, before appending anything, if a stored binning differs
+        from the assistant's. Returns the appended histograms.
+        """
+        if isinstance(store, str):
+            store = HistogramStore(store)
+        names = store.names() if names is None else names
+
+        # every histogram is checked before any is appended
+        edges = self.bin_edges_array()
+        for name in names:
+            stored = store[name]["edges"]
+            if len(stored) != len(edges) or not np.allclose(stored, edges, rtol = 1e-9, atol = 0.0):
+                raise ValueError(f"'{name}' in the store '{store.path}' has a different binning than this assistant")
+
+        attached = []
+        for name in names:
+            entry = store[name]
+            hist = _th1d_from_binning(name, entry["title"] or self.hist_title(), _binning_from_edges(entry["edges"]))
+            hist.SetEntries(entry["entries"])
+            self._store_views[id(hist)] = (entry["contents"], entry["sumw2"])
+            self.append_histogram(hist,
+                weight      = entry["weight"],
+                show_legend = entry["legend"] != "",
+                legend_name = entry["legend"],
+                **_role_flags(entry["role"] or "background"))
+            attached.append(hist)
+        self.log.msg("%d histogram(s) were attached from the store '%s'.", len(attached), store.path)
+        return attached
+
+    def _materialize_attached(self) -> None:
+        """Copies the store arrays of attached histograms into their TH1D buffers (once)."""
+        for hist in self.histograms:
+            views = self._store_views.pop(id(hist), None)
+            if views is None:
+                continue
+            entries = hist.GetEntries()
+            hist.Sumw2()
+            _contents_view(hist)[:] = views[0]
+            _sumw2_view(hist)[:] = views[1]
+            hist.ResetStats()
+            hist.SetEntries(entries)
+
+    def book_master_histogram(self, hist_name = "", fine_factor : int = 10):
+        """
+        Books a master histogram with 'fine_factor' sub-bins per booked bin. Fill it
+        once (e.g. with fill_from_arrays()) and derive coarser binnings from it with
+        rebin_histogram() instead of refilling from the trees.
+        """
+        edges = _subdivide_edges(self.bin_edges_array(), fine_factor)
+        if self.bin_edges is None:
+            binning = [self.n_bins * fine_factor, self.x_min, self.x_max]
+        else:
+            binning = {"edges" : edges.tolist()}
+        hist = _th1d_from_binning(hist_name, self.hist_title(), binning)
+        hist.Sumw2()
+        self.log.msg("Booked master histogram '%s' with %d bins.", hist_name, len(edges) - 1)
+        return hist
+
+    def master_assistant(self, fine_factor : int = 10):
+        """
+        New PlottingAssistant with the same titles and 'fine_factor' sub-bins per bin.
+        Its fill_from_file(), fill_from_files(), fill_streaming() and FillPlan fills
+        give master histograms for rebin_histogram() (and share the histogram cache).
+        """
+        x_title, y_title = self._axis_titles
+        if self.bin_edges is not None:
+            binning = {"bin_edges" : _subdivide_edges(self.bin_edges, fine_factor)}
+        else:
+            binning = {"n_bins" : self.n_bins * fine_factor, "x_range" : list(self.x_range)}
+        master = PlottingAssistant(
+            x_title       = x_title,
+            units         = self.units,
+            y_title       = y_title,
+            graphics_pool = self._pool,
+            log_level     = self.log.level,
+            **binning
+        )
+        master.histogram_cache = self.histogram_cache
+        master.chunk_size = self.chunk_size
+        return master
+
+    def rebin_histogram(self, hist, edges = None, n_bins = None, target_rel_error = None, hist_name = ""):
+        """
+        New TH1D with the contents and sumw2 of the fine histogram 'hist' merged into
+        coarser bins ('hist' is not modified). Every new edge has to be an edge of 'hist'.
+            edges            : explicit (variable) bin edges
+            n_bins           : 'n_bins' uniform bins over the range of 'hist'
+            target_rel_error : edges from auto_bin_edges([hist], target_rel_error)
+            nothing          : the booked binning of this assistant, so the result
+                               can be appended to it directly
+        Fine bins outside the new range end up in the underflow/overflow.
+        """
+        try:
+            fine_edges = _bin_edges(hist)
+            if edges is None and n_bins is None and target_rel_error is None:
+                edges = self.bin_edges_array()
+                title = self.hist_title()
+            else:
+                title = f"{hist.GetTitle()};{hist.GetXaxis().GetTitle()};{hist.GetYaxis().GetTitle()}"
+            if target_rel_error is not None:
+                edges = self.auto_bin_edges([hist], target_rel_error)
+            elif n_bins is not None:
+                edges = np.linspace(fine_edges[0], fine_edges[-1], n_bins + 1)
+
+            idx = _coarse_indices(fine_edges, edges)
+            edges = fine_edges[idx]
+            binning = _binning_from_edges(edges)
+
+            rebinned = _th1d_from_binning(hist_name or f"{hist.GetName()}_rebinned", title, binning)
+            rebinned.Sumw2()
+            contents, sumw2 = self._raw_arrays(hist)
+            _contents_view(rebinned)[:] = _merge_bins(contents, idx)
+            _sumw2_view(rebinned)[:] = _merge_bins(sumw2, idx)
+            rebinned.ResetStats()
+            rebinned.SetEntries(hist.GetEntries())
+            _copy_style(hist, rebinned)
+            self.log.msg("Rebinned '%s' from %d to %d bins.", hist.GetName(), len(fine_edges) - 1, len(edges) - 1)
+
+        except Exception as e:
+            self.log.err_msg(f"Could not rebin '{hist.GetName()}': {e}")
+            return None
+
+        return rebinned
+
+    def auto_bin_edges(self, histograms = None, target_rel_error : float = 0.1):
+        """
+        Variable bin edges, a subset of the edges of 'histograms' (default: the stacked
+        backgrounds, with their append weights), such that every merged bin of their
+        sum has a relative MC-stat error sqrt(sumw2)/content <= target_rel_error.
+        Bins are merged from the high-x end; pass the result to rebin_histogram().
+        """
+        if histograms is None:
+            histograms = self.stacked_histograms
+        if len(histograms) == 0:
+            raise ValueError("No histograms to derive the binning from.")
+        if target_rel_error <= 0:
+            raise ValueError(f"target_rel_error must be positive, got {target_rel_error}")
+
+        signature = _binning_signature(histograms[0])
+        contents, sumw2 = 0.0, 0.0
+        for hist in histograms:
+            if _binning_signature(hist) != signature:
+                raise ValueError(f"'{hist.GetName()}' does not have the binning of '{histograms[0].GetName()}'")
+            hist_contents, hist_sumw2 = self._weighted_arrays(hist)
+            contents = contents + hist_contents[1:-1]
+            sumw2 = sumw2 + hist_sumw2[1:-1]
+
+        fine_edges = _bin_edges(histograms[0])
+        edges = fine_edges[_stat_merge_indices(contents, sumw2, target_rel_error)]
+        self.log.msg("Derived %d bins from %d for a relative MC-stat error <= %g.",
+                     len(edges) - 1, len(fine_edges) - 1, target_rel_error)
+        return edges
+
+    def analyze_histogram(self, hist, print_table = True) -> dict:
+        """
+        Statistics of 'hist' (with its append weight) computed in one pass over its
+        arrays; see _histogram_statistics() for the keys. 'bins' holds the per-bin
+        table (low, high, content, error, rel_error, effective_entries).
+        print_table: also print the summary and the bin table through the logger.
+        """
+        contents, sumw2 = self._weighted_arrays(hist)
+        stats = _histogram_statistics(contents, sumw2, hist.GetEntries(), _bin_edges(hist))
+        stats["name"] = hist.GetName()
+        if print_table and self.log.enabled(Log.INFO):
+            self.print_histogram_statistics(stats)
+        return stats
+
+    def print_histogram_statistics(self, stats) -> None:
+        """Prints an analyze_histogram() result: summary lines and one message for the bin table."""
         self.log.msg("UNDERFLOW/OVERFLOW:")
-        self.log.msg(f"Underflow (bin 0): {underflow} ± {underflow_error}")
-        self.log.msg(f"Overflow (bin {nbins + 1}): {overflow} ± {overflow_error}")
-        
-        # Totals
-        total_entries = hist.GetEntries()
-        total_weighted = hist.Integral(0, nbins + 1)  # All bins including under/overflow
-        total_in_range = hist.Integral()  # Only regular bins
-        
+        self.log.msg("Underflow: %s ± %s", stats["underflow"], stats["underflow_error"])
+        self.log.msg("Overflow: %s ± %s", stats["overflow"], stats["overflow_error"])
         self.log.msg("TOTALS:")
-        self.log.msg(f"Total entries: {total_entries}")
-        self.log.msg(f"Total weighted events (all bins): {total_weighted}")
-        self.log.msg(f"Total in range (regular bins only): {total_in_range}")
-        
-        # Detailed bin information
+        self.log.msg("Total entries: %s", stats["entries"])
+        self.log.msg("Effective entries: %.2f", stats["effective_entries"])
+        self.log.msg("Total weighted events (all bins): %s", stats["integral"])
+        self.log.msg("Total in range (regular bins only): %s", stats["integral_in_range"])
+
+        bins = stats["bins"]
         self.log.msg("DETAILED BIN INFORMATION:")
-        self.log.msg("Bin\tContent\t\tAbs. Error\tRel. Error (%)")
-        for i in range(1, nbins + 1):
-            content = hist.GetBinContent(i)
-            error = hist.GetBinError(i)
-            if content > 0:
-                relative_error = (error / content) * 100
-            else:
-                relative_error = 0
-        
-            self.log.msg(f"{i}\t{content:.6f}\t{error:.6f}\t{relative_error:.2f}%")
-    
-    
-    def fill_from_file(self, root_file_path) -> None:
-        pass
+        self.log.msg(lambda: "\n".join(
+            ["Bin\tContent\t\tAbs. Error\tRel. Error (%)"] +
+            [f"{i}\t{c:.6f}\t{e:.6f}\t{r:.2f}%"
+             for i, (c, e, r) in enumerate(zip(bins["content"], bins["error"], 100 * bins["rel_error"]), start = 1)]
+        ))
+
+    def histogram_statistics(self, histograms = None) -> dict:
+        """
+        Summary statistics of the appended histograms (or of 'histograms') as a table:
+        a dict of columns with one row per histogram ('name', 'role', 'weight' and the
+        scalar keys of analyze_histogram()), plus 'bins': the per-bin tables by name.
+        """
+        histograms = self.histograms if histograms is None else histograms
+        rows = [self.analyze_histogram(hist, print_table = False) for hist in histograms]
+
+        table = {
+            "name"   : [row["name"] for row in rows],
+            "role"   : [self._hist_info.get(id(hist), {}).get("role", "") for hist in histograms],
+            "weight" : np.array([self.histogram_weight(hist) for hist in histograms])
+        }
+        for key in _STATISTICS_COLUMNS:
+            table[key] = np.array([row[key] for row in rows])
+        table["bins"] = {row["name"] : row["bins"] for row in rows}
+        return table
+
+    def dump_histogram_statistics(self, path, histograms = None) -> dict:
+        """
+        Writes histogram_statistics() to 'path': '.csv' (the summary table, one row per
+        histogram) or '.json' (summary and per-bin tables). Returns the table.
+        """
+        table = self.histogram_statistics(histograms)
+        columns = ["name", "role", "weight"] + list(_STATISTICS_COLUMNS)
+        if path.endswith(".csv"):
+            with open(path, "w", newline = "") as f:
+                writer = csv.writer(f)
+                writer.writerow(columns)
+                for idx in range(len(table["name"])):
+                    writer.writerow([table[key][idx] for key in columns])
+        else:
+            with open(path, "w") as f:
+                json.dump({
+                    "summary" : {key : (np.asarray(table[key]).tolist()) for key in columns},
+                    "bins"    : {name : {key : value.tolist() for key, value in bins.items()}
+                                 for name, bins in table["bins"].items()}
+                }, f, indent = 2)
+        self.log.msg("Histogram statistics were saved in '%s'.", path)
+        return table
+
+    @_profiled("fill")
+    def fill_from_file(self, root_file_path,
+        tree_name     = "",
+        expression    = "",
+        cut           = "",
+        weight        = "",
+        hist_name     = "",
+        scale         = 1.0,
+        is_signal     = False,
+        is_background = False,
+        is_data       = False,
+        show_legend   = False,
+        legend_name   = "",
+        n_threads     = 0 ):
+        """
+        Fills a histogram with the booked binning from 'tree_name' in 'root_file_path'
+        using a compiled RDataFrame event loop (implicit multi-threading with
+        'n_threads', 0 = all cores), then appends it with the requested role.
+        expression: branch name or C++ expression to histogram
+        cut:        optional C++ selection
+        weight:     optional C++ per-event weight expression
+        scale:      weight passed to append_histogram()
+        Returns the filled TH1D.
+        """
+        role = "background" if is_background else ("signal" if is_signal else "data")
+        plan = FillPlan(root_file_path, tree_name, n_threads)
+        plan.log = self.log
+        plan.add(self, expression,
+            cut         = cut,
+            weight      = weight,
+            role        = role,
+            legend      = legend_name,
+            hist_name   = hist_name,
+            scale       = scale,
+            show_legend = show_legend)
+
+        return plan.run()[0]
+
+    @_profiled("fill")
+    def fill_from_files(self, root_files,
+        tree_name     = "",
+        expression    = "",
+        cut           = "",
+        weight        = "",
+        hist_name     = "",
+        scale         = 1.0,
+        is_signal     = False,
+        is_background = False,
+        is_data       = False,
+        show_legend   = False,
+        legend_name   = "",
+        n_workers     = None ):
+        """
+        Fills one process spread over many files ('root_files': list and/or glob
+        patterns) with a pool of 'n_workers' processes, one file per task. The
+        per-file histograms are merged by a pairwise tree reduction in file order,
+        so the result is bit-identical whatever the scheduling. Files already in
+        the histogram cache (see set_histogram_cache()) are not re-read.
+        Returns the filled TH1D.
+        """
+        files = _expand_inputs(root_files)
+        if files == []:
+            raise ValueError(f"No input files match {root_files}")
+        hist_name = hist_name if hist_name != "" else self._default_hist_name()
+        self.log.proc_title("Filling Histogram '%s' From %d File(s)", hist_name, len(files))
+
+        parts = [None] * len(files)
+        keys = [None] * len(files)
+        if self.histogram_cache is not None:
+            for idx, path in enumerate(files):
+                keys[idx] = self.histogram_cache.key(path, tree_name, expression, cut, weight, self.binning_key())
+                parts[idx] = self.histogram_cache.get(keys[idx])
+
+        missing = [idx for idx, part in enumerate(parts) if part is None]
+        start = time.perf_counter()
+        n_events = 0
+        if missing:
+            task = (tree_name, expression, cut, weight, self.binning_key())
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers = n_workers, mp_context = context) as pool:
+                futures = {pool.submit(_fill_file_arrays, files[idx], *task) : idx for idx in missing}
+                for future in as_completed(futures):
+                    idx = futures[future]
+                    try:
+                        parts[idx] = future.result()
+                    except Exception as e:
+                        self.log.err_msg("Could not fill from '%s': %s", files[idx], e)
+                        raise RuntimeError(f"Filling from '{files[idx]}' failed") from e
+                    n_events += parts[idx]["events"]
+                    if keys[idx] is not None:
+                        self.histogram_cache.put(keys[idx], parts[idx]["contents"], parts[idx]["sumw2"], parts[idx]["entries"])
+
+            elapsed = time.perf_counter() - start
+            rate = n_events / elapsed if elapsed > 0 else float("inf")
+            self.log.msg("Processed %d events from %d file(s) in %.2f s: %.0f events/s.", n_events, len(missing), elapsed, rate)
+        if len(missing) < len(files):
+            self.log.msg("%d of %d file(s) loaded from the cache.", len(files) - len(missing), len(files))
+
+        hist = self._histogram_from_arrays(hist_name,
+            _tree_reduce([part["contents"] for part in parts]),
+            _tree_reduce([part["sumw2"] for part in parts]),
+            _tree_reduce([float(part["entries"]) for part in parts]))
+
+        self.input_files.extend(files)
+        self.append_histogram(hist,
+            weight        = scale,
+            is_signal     = is_signal,
+            is_background = is_background,
+            is_data       = is_data,
+            show_legend   = show_legend,
+            legend_name   = legend_name)
+
+        return hist
+
+    def set_chunk_size(self, chunk_size : int) -> None:
+        """Number of tree entries read per chunk by fill_streaming()."""
+        self.chunk_size = chunk_size
+
+    @_profiled("fill")
+    def fill_streaming(self, root_file_path,
+        tree_name     = "",
+        expression    = "",
+        cut           = "",
+        weight        = "",
+        hist_name     = "",
+        scale         = 1.0,
+        is_signal     = False,
+        is_background = False,
+        is_data       = False,
+        show_legend   = False,
+        legend_name   = "",
+        chunk_size    = None ):
+        """
+        Like fill_from_file(), but reads the tree in chunks of 'chunk_size' entries
+        (default: set_chunk_size()) and accumulates each chunk into the histogram,
+        so peak memory is bounded by the chunk size whatever the input size.
+        'root_file_path' may be a path, a glob pattern or a list of them.
+        Progress and throughput are logged after every chunk.
+        Returns the filled TH1D.
+        """
+        chunk_size = chunk_size or self.chunk_size
+        hist_name = hist_name if hist_name != "" else self._default_hist_name()
+        self.log.proc_title("Streaming Histogram '%s' From '%s'", hist_name, root_file_path)
+        inputs = _expand_inputs(root_file_path)
+
+        key = None
+        cached = None
+        if self.histogram_cache is not None:
+            key = self.histogram_cache.key(inputs, tree_name, expression, cut, weight, self.binning_key())
+            cached = self.histogram_cache.get(key)
+
+        if cached is not None:
+            hist = self._histogram_from_arrays(hist_name, cached["contents"], cached["sumw2"], cached["entries"])
+            self.log.msg("The histogram was loaded from the cache.")
+        else:
+            hist = self._new_histogram(hist_name)
+            hist.Sumw2()
+            start = time.perf_counter()
+            for values, weights, n_done, n_total in _iter_tree_chunks(inputs, tree_name, expression, cut, weight, chunk_size):
+                self.fill_from_arrays(hist, values, weights)
+                elapsed = time.perf_counter() - start
+                self.log.msg("Processed %d / %d entries (%.1f%%), %.0f events/s.",
+                    n_done, n_total, 100.0 * n_done / max(n_total, 1), n_done / elapsed if elapsed > 0 else float("inf"))
+            if key is not None:
+                self.histogram_cache.put(key, _contents_view(hist), _sumw2_view(hist), hist.GetEntries())
+
+        self.input_files.extend(inputs)
+        self.append_histogram(hist,
+            weight        = scale,
+            is_signal     = is_signal,
+            is_background = is_background,
+            is_data       = is_data,
+            show_legend   = show_legend,
+            legend_name   = legend_name)
+
+        return hist
 
     def design_histogram(self, hist, 
         line_color = None,
@@ -421,110 +1713,102 @@ class PlottingAssistant:
         if fill_style != None:
             hist.SetFillStyle(fill_style)
 
-    def save_histograms(self, root_file_name) -> None:
+    @_profiled("save_histograms")
+    def save_histograms(self, root_file_name = "",
+        mode              = "RECREATE",
+        directory         = "",
+        by_role           = False,
+        compression       = None,
+        compression_level = None,
+        writer            = None ) -> None:
+        """
+        Writes the appended histograms (with their append weights) and the summed
+        background 'h_bkg' in one batched pass.
+        mode:              TFile option; "UPDATE" adds to an existing file
+        directory:         subdirectory for this plot, e.g. "SR1/HT"
+        by_role:           put the histograms in 'background', 'signal' and 'data'
+                           subdirectories of 'directory' ('h_bkg' stays in 'directory')
+        compression:       "zlib", "lzma", "lz4" or "zstd", with 'compression_level'
+        writer:            an open HistogramWriter; 'root_file_name', 'mode' and the
+                           compression are then ignored and the file is not closed
+        """
 
         self.log.proc_title("Saving The Histograms")
+        self._materialize_attached()
 
-        root_file = ROOT.TFile(root_file_name, "RECREATE")
-        if self.histograms != []:
-            for hist in self.histograms:
-                try:
-                    name = hist.GetName()
-                    hist.Write()
-                    self.log.msg(f"The histogram '{name}' was saved successfully in '{root_file_name}'.")
-                except Exception as e:
-                    self.log.err_msg(f"The histogram '{name}' was not saved in '{root_file_name}' due to the Error: {e}.")
-
+        items = []
+        for hist in self.histograms:
+            role = self._hist_info.get(id(hist), {}).get("role", "")
+            path = "/".join(part for part in (directory, role if by_role else "") if part != "")
+            items.append((path, hist.GetName(), self._scaled(hist)))
         if self.stacked_histograms != []:
-            bkg_total = None
-            for hist in self.stacked_histograms:
-                if bkg_total is None:
-                    bkg_total = hist.Clone('h_bkg')
-                    bkg_total.SetDirectory(root_file)
-                else:
-                    bkg_total.Add(hist)
-            try:
-                if bkg_total:
-                    bkg_total.Write()
-            except Exception as e:
-                self.log.err_msg(f"Could not save the stacked histogram in '{root_file_name}' due to the Error: {e}.")
+            items.append((directory, "h_bkg", self._bkg_total_hist("h_bkg")))
 
-        root_file.Close()
-        
-    def make_bkg_total_with_uncertainty(self, per_proc_sys_fracs=None, lumi_frac=0.0, shape_variations=None):
+        target = writer.path if writer is not None else root_file_name
+        try:
+            if writer is None:
+                with HistogramWriter(root_file_name, mode, compression, compression_level) as own_writer:
+                    written = own_writer.write(items)
+            else:
+                written = writer.write(items)
+            self.log.msg("%d object(s) were saved in '%s'.", written, f"{target}:/{directory}")
+            if written != len(items):
+                self.log.err_msg("%d object(s) could not be saved in '%s'.", len(items) - written, target)
+        except Exception as e:
+            self.log.err_msg(f"The histograms were not saved in '{target}' due to the Error: {e}.")
+
+    @_profiled("bkg_uncertainty")
+    def make_bkg_total_with_uncertainty(self, per_proc_sys_fracs=None, lumi_frac=0.0, shape_variations=None,
+                                        nuisances=None, return_covariance=False):
         """
         per_proc_sys_fracs: list of arrays (length nbins) — fractional uncorrelated sys per process
         shape_variations: list of tuples per process [(h_up, h_down), ...] or None
         lumi_frac: scalar fractional correlated normalization uncertainty
-        Returns: (bkg_total_TH1, bkg_total_TGraphErrors)
+        nuisances: dict {name: variations} of named nuisances, each fully correlated across
+                   processes and bins. 'variations' is a list with one item per background
+                   process (append order) or a dict keyed by histogram name; an item is None,
+                   a fractional shift (scalar or array of length nbins) or an (up, down) pair
+                   of histograms/arrays (symmetrised as (up - down) / 2)
+        return_covariance: also return the (nbins, nbins) covariance matrix
+        Returns: (bkg_total_TH1, bkg_total_TGraphErrors[, covariance])
         """
         if not self.stacked_histograms:
             raise RuntimeError("No background histograms available to build total.")
 
         nbins = self.stacked_histograms[0].GetNbinsX()
-        # 1) build nominal total
-        bkg_total = self.stacked_histograms[0].Clone("bkg_total")
-        for h in self.stacked_histograms[1:]:
-            bkg_total.Add(h)
-
-        # Ensure Sumw2 present
-        bkg_total.Sumw2()
-
-        # 2) start covariance (diagonal) with statistical variances:
-        cov_diag = [bkg_total.GetBinError(i+1)**2 for i in range(nbins)]
-
-        # 3) uncorrelated per-process fractional sys
-        if per_proc_sys_fracs:
-            for p_h, p_frac in zip(self.stacked_histograms, per_proc_sys_fracs):
-                for i in range(1, nbins+1):
-                    Ni = p_h.GetBinContent(i)
-                    cov_diag[i-1] += (p_frac[i-1] * Ni)**2
-
-        # 4) shape variations (up/down): add in quadrature (uncorrelated across processes)
-        if shape_variations:
-            for (h_up, h_down), p_h in zip(shape_variations, self.stacked_histograms):
-                for i in range(1, nbins+1):
-                    nom = p_h.GetBinContent(i)
-                    d_up = h_up.GetBinContent(i) - nom
-                    d_down = nom - h_down.GetBinContent(i)
-                    delta = max(abs(d_up), abs(d_down))  # envelope; choose method you prefer
-                    cov_diag[i-1] += delta*delta
-
-        # 5) correlated lumi
-        if lumi_frac and lumi_frac > 0:
-            for i in range(1, nbins+1):
-                tot = bkg_total.GetBinContent(i)
-                cov_diag[i-1] += (lumi_frac * tot)**2
-
-        # 6) set bin errors in the TH1D object
-        for i in range(1, nbins+1):
-            bkg_total.SetBinError(i, (cov_diag[i-1])**0.5)
-        
-        # 7) Create the TGraphErrors object for the error band
-        x_values = []
-        y_values = []
-        x_errors = [] # Half bin width for the horizontal uncertainty
-        y_errors = [] # Calculated total uncertainty
-        
-        for i in range(1, nbins + 1):
-            x_values.append(bkg_total.GetBinCenter(i))
-            y_values.append(bkg_total.GetBinContent(i))
-            x_errors.append(bkg_total.GetBinWidth(i) / 2.0)
-            y_errors.append(bkg_total.GetBinError(i))
-
-        # Convert lists to C-type arrays required by TGraphErrors constructor
-        from array import array
-        ax = array('d', x_values)
-        ay = array('d', y_values)
-        aex = array('d', x_errors)
-        aey = array('d', y_errors)
+        # 1) nominal total from the running background sum
+        bkg_total = self._bkg_total_hist("bkg_total")
+
+        # 2) processes x bins arrays, then the full covariance with matrix operations
+        weighted = [self._weighted_arrays(h) for h in self.stacked_histograms]
+        contents = np.array([c[1:nbins+1] for c, _ in weighted])
+        sumw2 = np.array([w2[1:nbins+1] for _, w2 in weighted])
+        names = [h.GetName() for h in self.stacked_histograms]
+        cov = _background_covariance(contents, sumw2, names,
+            per_proc_sys_fracs = per_proc_sys_fracs,
+            lumi_frac          = lumi_frac,
+            shape_variations   = shape_variations,
+            nuisances          = nuisances)
+        self.bkg_covariance = cov
+
+        # 3) set bin errors in the TH1D object (error^2 = covariance diagonal)
+        _sumw2_view(bkg_total)[1:nbins+1] = np.diag(cov)
+
+        # 4) Create the TGraphErrors object for the error band
+        edges = _bin_edges(bkg_total)
+        x_values = 0.5 * (edges[1:] + edges[:-1])
+        x_errors = 0.5 * np.diff(edges) # Half bin width for the horizontal uncertainty
+        y_values = np.array(_contents_view(bkg_total)[1:nbins+1])
+        y_errors = np.sqrt(np.diag(cov)) # Calculated total uncertainty
 
         # Create the TGraphErrors
-        bkg_gr_errors = ROOT.TGraphErrors(nbins, ax, ay, aex, aey)
+        bkg_gr_errors = ROOT.TGraphErrors(nbins,
+            np.ascontiguousarray(x_values), np.ascontiguousarray(y_values),
+            np.ascontiguousarray(x_errors), np.ascontiguousarray(y_errors))
         bkg_gr_errors.SetName("bkg_total_errors")
         bkg_gr_errors.SetTitle("Background Total with Uncertainty")
 
-        # 8) Set style for the TGraphErrors so it can be drawn directly
+        # 5) Set style for the TGraphErrors so it can be drawn directly
         # E2 option with TGraphErrors draws a shaded area for the error bars only
         bkg_gr_errors.SetFillStyle(3004) # Hatched style
         bkg_gr_errors.SetFillColor(ROOT.kBlack)
@@ -532,12 +1816,12 @@ class PlottingAssistant:
         bkg_gr_errors.SetLineWidth(2)
         bkg_gr_errors.SetLineColor(ROOT.kBlack) # Line color for the top/bottom edges of the band
 
+        if return_covariance:
+            return bkg_total, bkg_gr_errors, cov
         return bkg_total, bkg_gr_errors
 
-    def draw_plot(self, plot_name) -> None:
-
-        self.log.proc_title("Drawing The Plot")
-
+    def y_range(self) -> tuple:
+        """(y_min, y_max) used for drawing, from the current peak and log-y setting."""
         # setting good y-max:
         if self.y_peak <= 0:
             y_max = 1.0 if not self.y_log else 10.0
@@ -545,6 +1829,294 @@ class PlottingAssistant:
             y_max = self.y_peak * (1e5 if self.y_log else 3)
 
         y_min = 5e-1 if self.y_log else 0
+        return y_min, y_max
+
+    @_profiled("compute")
+    def compute_plot_data(self, **uncertainties) -> dict:
+        """
+        Computes everything behind the plot as NumPy arrays, without creating any
+        canvas, legend or stack:
+            edges            : bin edges (n_bins + 1)
+            stack_*          : names, legends, contents and sumw2 of the backgrounds,
+                               in stacking order (bottom first)
+            bkg_total        : summed background per bin
+            bkg_uncertainty  : total background uncertainty per bin
+            bkg_covariance   : bin-by-bin covariance (n_bins x n_bins)
+            overlay_*        : names, roles, legends, contents and errors of signals/data
+            y_range, y_log   : axis range used by draw_plot()
+        Keyword arguments are passed on as in make_bkg_total_with_uncertainty()
+        (per_proc_sys_fracs, lumi_frac, shape_variations, nuisances) and override
+        those of set_uncertainties().
+        """
+        if self.histograms == []:
+            raise RuntimeError("No histograms appended, nothing to compute.")
+        uncertainties = {**self.uncertainties, **uncertainties}
+
+        edges = _bin_edges(self.histograms[0])
+        nbins = len(edges) - 1
+        data = {"edges" : edges}
+
+        backgrounds = list(self.stacked_histograms)
+        weighted = [self._weighted_arrays(h) for h in backgrounds]
+        contents = np.array([c[1:nbins+1] for c, _ in weighted]).reshape(len(backgrounds), nbins)
+        sumw2 = np.array([w2[1:nbins+1] for _, w2 in weighted]).reshape(len(backgrounds), nbins)
+        if self._stack_in_order and backgrounds:
+            order = np.argsort(contents.sum(axis=1), kind="stable")
+        else:
+            order = np.arange(len(backgrounds))
+
+        names = [h.GetName() for h in backgrounds]
+        data["stack_names"] = [names[i] for i in order]
+        data["stack_legends"] = [self._hist_info.get(id(backgrounds[i]), {}).get("legend", "") for i in order]
+        data["stack_contents"] = contents[order]
+        data["stack_sumw2"] = sumw2[order]
+
+        if backgrounds:
+            cov = _background_covariance(contents, sumw2, names, **uncertainties)
+            data["bkg_total"] = contents.sum(axis=0)
+            data["bkg_uncertainty"] = np.sqrt(np.diag(cov))
+            data["bkg_covariance"] = cov
+        else:
+            data["bkg_total"] = np.zeros(nbins)
+            data["bkg_uncertainty"] = np.zeros(nbins)
+            data["bkg_covariance"] = np.zeros((nbins, nbins))
+
+        overlays = self.single_histograms
+        data["overlay_names"] = [h.GetName() for h in overlays]
+        data["overlay_roles"] = [self._hist_info.get(id(h), {}).get("role", "") for h in overlays]
+        data["overlay_legends"] = [self._hist_info.get(id(h), {}).get("legend", "") for h in overlays]
+        weighted = [self._weighted_arrays(h) for h in overlays]
+        data["overlay_contents"] = np.array([c[1:nbins+1] for c, _ in weighted]).reshape(len(overlays), nbins)
+        data["overlay_errors"] = np.sqrt(np.array([w2[1:nbins+1] for _, w2 in weighted]).reshape(len(overlays), nbins))
+
+        data["y_range"] = np.array(self.y_range())
+        data["y_log"] = self.y_log
+        return data
+
+    def export_plot_data(self, path, **uncertainties) -> dict:
+        """
+        Writes compute_plot_data() to 'path': '.npz' (NumPy archive) or '.json'.
+        Returns the computed data.
+        """
+        data = self.compute_plot_data(**uncertainties)
+        if path.endswith(".json"):
+            with open(path, "w") as f:
+                json.dump({key : (value.tolist() if isinstance(value, np.ndarray) else value)
+                           for key, value in data.items()}, f)
+        else:
+            np.savez(path, **{key : np.asarray(value) for key, value in data.items()})
+        self.log.msg("Plot data was saved in '%s'.", path)
+        return data
+
+    @_profiled("cut_scan")
+    def scan_cuts(self,
+                  signals             = None,
+                  modes               = ("lower", "upper", "window"),
+                  metric              = "z_asimov",
+                  rel_bkg_uncertainty = 0.0,
+                  min_background      = 0.0,
+                  plot_name           = "",
+                  formats             = None ) -> dict:
+        """
+        Scans every lower cut (x >= edge), upper cut (x < edge) and window on the bin
+        edges at once, from cumulative sums of the weighted signal and summed background
+        arrays. Returns, per signal name:
+            edges                 : the n_bins + 1 cut values
+            lower, upper          : arrays over the edges of s, b, s_over_sqrt_b and
+                                    z_asimov, each with its MC-stat '_err'
+            window                : the same as (n_edges x n_edges) arrays indexed
+                                    [low edge, high edge], nan where high <= low
+            best                  : the cut maximising 'metric' ('z_asimov' or
+                                    's_over_sqrt_b') with b > min_background
+        signals:             names of signal histograms (default: all appended signals)
+        rel_bkg_uncertainty: relative background uncertainty in the Asimov significance
+        plot_name:           if given, draws metric vs cut to '<plot_name>_<signal>.<format>'
+        """
+        if metric not in ("z_asimov", "s_over_sqrt_b"):
+            raise ValueError(f"metric must be 'z_asimov' or 's_over_sqrt_b', got '{metric}'")
+        unknown = set(modes) - {"lower", "upper", "window"}
+        if unknown:
+            raise ValueError(f"Unknown scan modes {sorted(unknown)}")
+        if self._bkg_sum is None:
+            raise RuntimeError("No background histograms appended, nothing to scan against.")
+
+        candidates = [h for h in self.single_histograms if self._hist_info.get(id(h), {}).get("role") == "signal"]
+        if signals is not None:
+            candidates = [h for h in candidates if h.GetName() in signals]
+        if candidates == []:
+            raise RuntimeError("No signal histograms to scan.")
+
+        self.log.proc_title("Cut Scan")
+        edges = _bin_edges(self.stacked_histograms[0])
+        bkg_cuts = dict(zip(("lower", "upper", "window"), zip(_cut_sums(self._bkg_sum), _cut_sums(self._bkg_sumw2))))
+
+        results = {}
+        for hist in candidates:
+            contents, sumw2 = self._weighted_arrays(hist)
+            if len(contents) != len(self._bkg_sum):
+                raise ValueError(f"'{hist.GetName()}' has {len(contents) - 2} bins, the stacked backgrounds have {len(self._bkg_sum) - 2}")
+            sig_cuts = dict(zip(("lower", "upper", "window"), zip(_cut_sums(contents), _cut_sums(sumw2))))
+
+            result = {"edges" : edges}
+            best = {metric : -np.inf}
+            for mode in modes:
+                (s, s_var), (b, b_var) = sig_cuts[mode], bkg_cuts[mode]
+                scan = _significances(s, s_var, b, b_var, rel_bkg_uncertainty)
+                result[mode] = scan
+
+                values = np.where(b > max(min_background, 0.0), scan[metric], np.nan)
+                if np.all(np.isnan(values)):
+                    continue
+                idx = np.unravel_index(np.nanargmax(values), values.shape)
+                if values[idx] > best[metric]:
+                    low, high = {
+                        "lower"  : (edges[idx[0]], None),
+                        "upper"  : (None, edges[idx[0]]),
+                        "window" : (edges[idx[0]], edges[idx[-1]])
+                    }[mode]
+                    best = {"mode" : mode, "low" : low, "high" : high}
+                    best.update({key : float(value[idx]) for key, value in scan.items()})
+
+            result["best"] = best if "mode" in best else None
+            results[hist.GetName()] = result
+            if result["best"] is not None:
+                self.log.msg("'%s': best %s cut [%s, %s] with S = %.4g, B = %.4g, %s = %.3f +- %.3f",
+                             hist.GetName(), best["mode"], best["low"], best["high"], best["s"], best["b"],
+                             metric, best[metric], best[f"{metric}_err"])
+            else:
+                self.log.err_msg("'%s': no cut with B > %g.", hist.GetName(), min_background)
+
+        if plot_name != "":
+            for name, result in results.items():
+                self._draw_scan(name, result, metric, plot_name, formats)
+        return results
+
+    def _draw_scan(self, signal_name, result, metric, plot_name, formats = None) -> None:
+        """Draws 'metric' vs the lower/upper cut value of one scan_cuts() result."""
+        formats = self.save_formats if formats is None else formats
+        canvas = ROOT.TCanvas(f"scan_canvas_{self._unique}", "", 800, 600)
+        legend = ROOT.TLegend(0.60, 0.75, 0.92, 0.90)
+        legend.SetBorderSize(0)
+        legend.SetFillStyle(0)
+        graphs = []
+        try:
+            for mode, color in (("lower", ROOT.kAzure + 1), ("upper", ROOT.kOrange + 7)):
+                if mode not in result:
+                    continue
+                values = result[mode][metric]
+                keep = np.isfinite(values)
+                if not keep.any():
+                    continue
+                graph = ROOT.TGraph(int(keep.sum()), np.ascontiguousarray(result["edges"][keep]), np.ascontiguousarray(values[keep]))
+                graph.SetLineColor(color)
+                graph.SetLineWidth(2)
+                graph.SetTitle(f";{self.x_title} cut;{'Z_{A}' if metric == 'z_asimov' else 'S/#sqrt{B}'}")
+                graph.Draw("AL" if graphs == [] else "L SAME")
+                legend.AddEntry(graph, f"x {'>' if mode == 'lower' else '<'} cut", "l")
+                graphs.append(graph)
+
+            if graphs != []:
+                legend.Draw()
+                has_format = bool(os.path.splitext(plot_name)[1])
+                base, ext = os.path.splitext(plot_name)
+                targets = [f"{base}_{signal_name}{ext}"] if has_format else [f"{plot_name}_{signal_name}.{format}" for format in formats]
+                for target in targets:
+                    canvas.SaveAs(target)
+                self.log.msg("The cut scan of '%s' was saved in %s.", signal_name, targets)
+        except Exception as e:
+            self.log.err_msg(f"The cut scan of '{signal_name}' was not drawn due to the Error: {e}.")
+        finally:
+            canvas.Close()
+
+    def _prepare_render(self) -> dict:
+        """
+        Builds the background stack (ordered if requested), the background legend
+        entries and the total background with its uncertainty band. The result is
+        cached, so repeated draw_plot() calls only re-render.
+        """
+        if self._render_cache is not None:
+            return self._render_cache
+        self._materialize_attached()
+
+        # drawn versions of the histograms, with their append weight applied
+        render = {
+            "bkg_total"    : None,
+            "total_errors" : None,
+            "scaled"       : {id(hist) : self._scaled(hist) for hist in self.histograms}
+        }
+        self.legend_sig.Clear()
+        for item in self.sig_histograms_legends:
+            self.legend_sig.AddEntry(item["hist"], item["legend"], "l")
+
+        if self.stacked_histograms != []:
+
+            self._build_stack(render["scaled"])
+
+            # errors propagate: a plot without its uncertainty band must not pass silently
+            bkg_total, total_errors = self.make_bkg_total_with_uncertainty(**self.uncertainties)
+            bkg_total.SetLineColor(ROOT.kBlack)
+            bkg_total.SetFillStyle(0)
+            bkg_total.SetLineWidth(1)
+            self.legend_bkg.AddEntry(total_errors, "Total SM", "fl")
+            render["bkg_total"] = bkg_total
+            render["total_errors"] = total_errors
+
+        self._render_cache = render
+        return render
+
+    @_profiled("stack")
+    def _build_stack(self, scaled) -> None:
+        # add histograms by order of smallest (in total events number) to highers,
+        # into a fresh stack so that nothing is ever added twice
+        try:
+            if self._stack_in_order:
+                stack_order = sorted(self.stacked_histograms, key=lambda h: scaled[id(h)].Integral())
+                legend_order = sorted(self.bkg_histograms_legends, key=lambda item: scaled[id(item["hist"])].Integral(), reverse =  True)
+            else:
+                stack_order = self.stacked_histograms
+                legend_order = self.bkg_histograms_legends
+
+            self.stack = ROOT.THStack(
+                f"Stack_{self._unique}",
+                f"Stack_{self._unique}; {self.x_title}; {self.y_title}"
+            )
+            for hist in stack_order:
+                self.stack.Add(scaled[id(hist)])
+
+            self.legend_bkg.Clear()
+            for item in legend_order:
+                self.legend_bkg.AddEntry(scaled[id(item["hist"])], item["legend"], "f")
+
+            self.log.msg("Background histograms stacked successfully.")
+        except Exception as e:
+            self.log.err_msg(f"Could not stack the background histograms due to the error: {e}")
+
+    @_profiled("draw_plot")
+    def draw_plot(self, plot_name, formats = None) -> None:
+        """
+        Draws and saves the plot. 'formats' overrides self.save_formats when
+        'plot_name' has no extension. Can be called repeatedly (e.g. after
+        set_logy()) to render variants of the same plot.
+        """
+
+        self.log.proc_title("Drawing The Plot")
+        self.plot_name = plot_name
+        formats = self.save_formats if formats is None else formats
+
+        has_format = bool(os.path.splitext(plot_name)[1])
+        targets = [plot_name] if has_format else [f"{plot_name}.{format}" for format in formats]
+        if self.skip_up_to_date:
+            try:
+                stale = [target for target in targets if not self._is_up_to_date(target)]
+            except OSError as e:
+                self.log.err_msg(f"Could not check the existing outputs ({e}), exporting all formats.")
+                stale = targets
+            if stale == []:
+                self.log.msg("All %d output(s) are up to date, nothing to draw.", len(targets))
+                return
+            targets = stale
+
+        y_min, y_max = self.y_range()
 
         def x_div(hist):
             if self.y_log:
@@ -552,24 +2124,17 @@ class PlottingAssistant:
             else:
                 pass
 
+        render = self._prepare_render()
+        # clones of weighted histograms pick up style changes made after the first draw
+        for hist in self.histograms:
+            scaled = render["scaled"][id(hist)]
+            if scaled is not hist:
+                _copy_style(hist, scaled)
+
         self.canvas.cd()
+        self.canvas.Clear()
         if self.stacked_histograms != []: 
 
-            # add histograms by order of smallest (in total events number) to highers
-            # if use this option remove self.stack.Add(hist) from append_histogram() function
-            if self._stack_in_order:
-                try:
-
-                    for hist in sorted(self.stacked_histograms, key=lambda h: h.Integral()):
-                        self.stack.Add(hist)
-                    
-                    for item in sorted(self.bkg_histograms_legends, key=lambda item: item["hist"].Integral(), reverse =  True):
-                        self.legend_bkg.AddEntry(item["hist"], item["legend"], "f")
-                        
-                    self.log.msg("Background histograms stacked in order successfully.")
-                except Exception as e:
-                    self.log.err_msg(f"Could not stack the background histograms in order due to the error: {e}")
-
             try:
                 self.stack.SetMaximum(y_max)
                 self.stack.SetMinimum(y_min)
@@ -578,15 +2143,11 @@ class PlottingAssistant:
                 self.stack.Draw(req)
 
                 x_div(self.stack)
-                self.log.msg(f"The stacted histogram was drawn successfully.")
-
-                bkg_total, total_errors = self.make_bkg_total_with_uncertainty()
-                bkg_total.SetLineColor(ROOT.kBlack)
-                bkg_total.SetFillStyle(0)
-                bkg_total.SetLineWidth(1)
-                bkg_total.Draw("SAME HIST")
-                total_errors.Draw("SAME E2")
-                self.legend_bkg.AddEntry(total_errors, "Total SM", "fl")
+                self.log.msg("The stacted histogram was drawn successfully.")
+
+                if render["bkg_total"] is not None:
+                    render["bkg_total"].Draw("SAME HIST")
+                    render["total_errors"].Draw("SAME E2")
                 self.canvas.Update()
 
             except Exception as e:
@@ -594,6 +2155,7 @@ class PlottingAssistant:
                 
             if self.single_histograms != []:
                 for hist in self.single_histograms:
+                    hist = render["scaled"][id(hist)]
                     try:
                         hist.SetMaximum(y_max)
                         hist.SetMinimum(y_min)
@@ -601,12 +2163,13 @@ class PlottingAssistant:
 
                         req = "hist"  + " same"
                         hist.Draw(req)
-                        self.log.msg(f"The histogram {hist.GetName()} was drawn successfully.")
+                        self.log.msg("The histogram %s was drawn successfully.", hist.GetName())
                     except Exception as e:
-                        self.log.err_msg(f"The histogram {hist.GetName()} was not drawn due to the Error: {e}.")
+                        self.log.err_msg("The histogram %s was not drawn due to the Error: %s.", hist.GetName(), e)
         else:
             if self.single_histograms != []:
                 for idx, hist in enumerate(self.single_histograms):
+                    hist = render["scaled"][id(hist)]
                     try:
                         hist.SetMaximum(y_max)
                         hist.SetMinimum(y_min)
@@ -615,21 +2178,21 @@ class PlottingAssistant:
                         req1 = "hist" 
                         req2 = "hist" + " same"
                         hist.Draw(req1 if idx == 0 else req2)
-                        self.log.msg(f"The histogram {hist.GetName()} was drawn successfully.")
+                        self.log.msg("The histogram %s was drawn successfully.", hist.GetName())
                     except Exception as e:
-                        self.log.err_msg(f"The histogram {hist.GetName()} was not drawn due to the Error: {e}.")
+                        self.log.err_msg("The histogram %s was not drawn due to the Error: %s.", hist.GetName(), e)
 
         if self.num_of_legends_bkg != 0:
             try:
                 self.legend_bkg.Draw("same")
-                self.log.msg(f"The backgrounds legend box was drawn successfully.")
+                self.log.msg("The backgrounds legend box was drawn successfully.")
             except Exception as e:
                 self.log.err_msg(f"The legend box was not drawn due to the Error: {e}.")
         
         if self.num_of_legends_sig != 0:
             try:
                 self.legend_sig.Draw("same")
-                self.log.msg(f"The signal legend box was drawn successfully.")
+                self.log.msg("The signal legend box was drawn successfully.")
             except Exception as e:
                 self.log.err_msg(f"The legend box was not drawn due to the Error: {e}.")
 
@@ -642,78 +2205,1196 @@ class PlottingAssistant:
                         label["y1"],
                         label["label"]
                     )
-                    lab = label["label"]
-                    self.log.msg(f"LaTex label {idx}: '{lab}' was added successfully.")
+                    self.log.msg("LaTex label %d: '%s' was added successfully.", idx, label["label"])
                 except Exception as e:
-                    self.log.err_msg(f"Could not add the LaTex label '{label["label"]}'' due to the error: {e}.")
+                    self.log.err_msg(f"Could not add the LaTex label '{label['label']}' due to the error: {e}.")
 
         # Saving the plot in required formats
+        self._export(targets)
+
+    def _export(self, targets) -> None:
+        """
+        Saves the canvas to every target file. With export_workers > 1 the canvas is
+        serialised once and the formats are produced concurrently by worker processes.
+        """
+        if self.export_workers > 1 and len(targets) > 1:
+            futures = {}
+            try:
+                payload = pickle.dumps(self.canvas)
+                pool = _get_export_pool(self.export_workers)
+                for target in targets:
+                    futures[pool.submit(_export_canvas, payload, target)] = target
+            except Exception as e:
+                self.log.err_msg(f"Could not start the parallel export ({e}), saving the remaining formats serially.")
+
+            # only the formats that were not produced by a worker are saved serially
+            done = set()
+            for future, target in futures.items():
+                try:
+                    _, wall, cpu = future.result()
+                    done.add(target)
+                    if self._profiling:
+                        self._record_stage(f"save.{os.path.splitext(target)[1].lstrip('.')}", wall, cpu)
+                except Exception as e:
+                    self.log.err_msg(f"Could not save the plot '{target}' in a worker ({e}), retrying serially.")
+            for target in targets:
+                if target not in done:
+                    self._save_as(target)
+        else:
+            for target in targets:
+                self._save_as(target)
+        self.log.msg("Plot was saved in %d format.", len(targets))
+
+    def _save_as(self, target) -> None:
         try:
-            has_format = bool(os.path.splitext(plot_name)[1])
-            if has_format:
-                self.canvas.SaveAs(plot_name)
-                self.log.msg("Plot was saved in one format.")
-            else:
-                for format in self.save_formats :
-                    self.canvas.SaveAs(f"{plot_name}.{format}")
-                self.log.msg(f"Plot was saved in {len(self.save_formats)} format.")
+            with self._profile(f"save.{os.path.splitext(target)[1].lstrip('.')}"):
+                self.canvas.SaveAs(target)
         except Exception as e:
-            self.log.err_msg(f"Could not save the plot. Returning the error: {e}")
+            self.log.err_msg(f"Could not save the plot '{target}'. Returning the error: {e}")
+
+    def _is_up_to_date(self, target) -> bool:
+        """True if 'target' exists and is newer than every known input file."""
+        if not self.input_files or not os.path.exists(target):
+            return False
+        newest_input = max(os.path.getmtime(path) for path in self.input_files)
+        return os.path.getmtime(target) > newest_input
 
     def set_logy(self, enable: bool) -> None:
 
         self.y_log = enable
 
-        if enable == True:
-            try:
-                self.canvas.SetLogy(enable)
-                self.log.msg("Log canvas enables")
-            except Exception as e:
-                self.log.err_msg(f"Could not log the canvas due to the error: {e}")
+        try:
+            if self._canvas is not None:
+                self._canvas.SetLogy(enable)
+            self.log.msg("Log canvas %s", "enabled" if enable else "disabled")
+        except Exception as e:
+            self.log.err_msg(f"Could not log the canvas due to the error: {e}")
 
     def clean_memory(self) -> None:
+        """
+        Releases every ROOT object created by this assistant: the canvas (closed, or
+        returned to the graphics pool), legends, stack, label, the cached background
+        total and band. References to the appended histograms are dropped, so they
+        are freed unless the caller still holds them. The assistant cannot draw
+        afterwards.
+        """
 
         self.log.proc_title("Cleaning Memory")
 
-        if self.histograms != []:
-            for hist in self.histograms[:]:
-                try:
-                    name = hist.GetName()
-                    # hist.Delete()
-                    self.log.msg(f"The histogram '{name}' is deleted.")
-                except Exception as e:
-                    self.log.err_msg(f"The histogram '{name}' was not deleted successfully due to the Error: {e}.")
-        
-        try:
-            # self.stack.Delete()
-            self.log.msg("The stacked histogram created by this class was deleted.")
-        except Exception as e:
-            self.log.err_msg(f"The stacked histogram created by this class was not deleted successfully due to the error {e}.")
+        n_hists = len(self.histograms)
+        self._render_cache = None
+        self.histograms = []
+        self._hist_info = {}
+        self.stacked_histograms = []
+        self.single_histograms = []
+        self.bkg_histograms_legends = []
+        self.sig_histograms_legends = []
+        self._bkg_sum = None
+        self._bkg_sumw2 = None
+        self._store_views = {}
+        self.uncertainties = {}
+        self.log.msg("References to %d histogram(s) were released.", n_hists)
+
+        self._stack = None
+        self._label = None
+        self.log.msg("The stacked histogram and the label created by this class were deleted.")
+
+        for legend in (self._legend_bkg, self._legend_sig):
+            if legend is None:
+                continue
+            try:
+                if self._pool is not None:
+                    self._pool.release_legend(legend)
+                else:
+                    legend.Clear()
+                self.log.msg("The legend '%s' created by this class was deleted.", legend.GetName())
+            except Exception as e:
+                self.log.err_msg("The legends created by this class were not deleted successfully due to the error %s.", e)
+        self._legend_bkg = None
+        self._legend_sig = None
 
-        try:
-            # self.legend_bkg.Delete()
-            self.log.msg("The lbackgroundegend created by this class was deleted.")
-        except Exception as e:
-            self.log.err_msg(f"The background legend created by this class was not deleted successfully due to the error {e}.")
-        
-        try:
-            # self.legend_sig.Delete()
-            self.log.msg("The signal legend created by this class was deleted.")
-        except Exception as e:
-            self.log.err_msg(f"The signal legend created by this class was not deleted successfully due to the error {e}.")
+        if self._canvas is not None:
+            try:
+                if self._pool is not None:
+                    self._pool.release_canvas(self._canvas)
+                else:
+                    self._canvas.Close()
+                self.log.msg("The canvas created by this class was closed.")
+            except Exception as e:
+                self.log.err_msg("The canvas created by this class was not closed successfully due to the error %s.", e)
+        self._canvas = None
 
-        try:
-            self.canvas.Close()
-            self.log.msg("The canvas created by this class was closed.")
-        except Exception as e:
-            self.log.err_msg(f"The canvas created by this class was not closed successfully due to the error {e}.")
-        
-        # try:
-        #     self.label.Delete()
-        #     self.log.msg("All the labels are deleted")
-        # except Exception as e:
-        #     self.log.err_msg(f"Could not delete the labels due to the error {e}.")
-            
         # cross check
         gc.collect()
-        
+
+
+class GraphicsPool:
+    """
+    Reuses canvases and legends across PlottingAssistant instances, so jobs that
+    build thousands of plots do not allocate new graphics objects per plot.
+
+        pool = GraphicsPool()
+        for variable in variables:
+            plot = PlottingAssistant(..., graphics_pool=pool)
+            ...
+            plot.draw_plot(variable)
+            plot.clean_memory()   # canvas and legends go back to the pool
+    """
+
+    def __init__(self, max_size = 8):
+        self.max_size = max_size
+        self._canvases = []
+        self._legends = []
+
+    def acquire_canvas(self):
+        if self._canvases:
+            return self._canvases.pop()
+        # module-wide counter: ROOT replaces canvases with the same name, also across pools
+        idx = next(_instance_ids)
+        return ROOT.TCanvas(f"PooledCanvas_{idx}", f"PooledCanvas_{idx}")
+
+    def release_canvas(self, canvas) -> None:
+        canvas.Clear()
+        canvas.SetLogy(False)
+        if len(self._canvases) < self.max_size:
+            self._canvases.append(canvas)
+        else:
+            canvas.Close()
+
+    def acquire_legend(self, x1, y1, x2, y2):
+        if not self._legends:
+            return ROOT.TLegend(x1, y1, x2, y2)
+        legend = self._legends.pop()
+        legend.SetX1(x1)
+        legend.SetY1(y1)
+        legend.SetX2(x2)
+        legend.SetY2(y2)
+        return legend
+
+    def release_legend(self, legend) -> None:
+        legend.Clear()
+        if len(self._legends) < 2 * self.max_size:
+            self._legends.append(legend)
+
+    def clear(self) -> None:
+        for canvas in self._canvases:
+            canvas.Close()
+        self._canvases = []
+        self._legends = []
+
+
+def _role_flags(role) -> dict:
+    """Maps a role name ('signal', 'background' or 'data') to append_histogram() flags."""
+    if role not in ("signal", "background", "data"):
+        raise ValueError(f"role must be 'signal', 'background' or 'data', got '{role}'")
+    return {
+        "is_signal"     : role == "signal",
+        "is_background" : role == "background",
+        "is_data"       : role == "data"
+    }
+
+
+def _expand_inputs(root_file_path) -> list:
+    """Input files of a path, glob pattern or list of them (patterns expanded and sorted)."""
+    paths = [root_file_path] if isinstance(root_file_path, str) else list(root_file_path)
+    files = []
+    for path in paths:
+        matches = sorted(glob.glob(path)) if glob.has_magic(path) else [path]
+        files.extend(matches)
+    return files
+
+
+def _file_stat_identity(path) -> list:
+    """[absolute path, size, mtime in ns]: changes whenever the file is rewritten."""
+    stat = os.stat(path)
+    return [os.path.abspath(path), stat.st_size, stat.st_mtime_ns]
+
+
+def _iter_tree_chunks(root_file_path, tree_name, expression, cut, weight, chunk_size):
+    """
+    Generator over the selected values of 'expression' in chunks of at most
+    'chunk_size' tree entries. Yields (values, weights, entries done, total entries);
+    'values' and 'weights' are views over the TTree::Draw buffers and are only
+    valid until the next chunk is read.
+    """
+    chain = ROOT.TChain(tree_name)
+    for path in _expand_inputs(root_file_path):
+        chain.Add(path)
+    n_total = chain.GetEntries()
+
+    if cut != "" and weight != "":
+        selection = f"({weight})*({cut})"
+    else:
+        selection = cut if cut != "" else weight
+
+    estimate = chunk_size + 1
+    chain.SetEstimate(estimate)
+    for first in range(0, n_total, chunk_size):
+        n_rows = chain.Draw(expression, selection, "goff", chunk_size, first)
+        if n_rows < 0:
+            raise RuntimeError(f"TTree::Draw failed for '{expression}' with selection '{selection}'")
+        if n_rows >= estimate:
+            # array expressions give several rows per entry: grow the buffer and redo this chunk
+            estimate = n_rows + 1
+            chain.SetEstimate(estimate)
+            n_rows = chain.Draw(expression, selection, "goff", chunk_size, first)
+
+        n_done = min(first + chunk_size, n_total)
+        if n_rows == 0:
+            yield np.empty(0), np.empty(0), n_done, n_total
+        else:
+            yield _buffer_view(chain.GetV1(), n_rows), _buffer_view(chain.GetW(), n_rows), n_done, n_total
+
+
+def _th1d_from_binning(name, title, binning):
+    """TH1D detached from any directory, from a PlottingAssistant.binning_key()."""
+    if isinstance(binning, dict):
+        edges = np.asarray(binning["edges"], dtype=np.float64)
+        hist = ROOT.TH1D(name, title, edges.size - 1, edges)
+    else:
+        n_bins, x_min, x_max = binning
+        hist = ROOT.TH1D(name, title, n_bins, x_min, x_max)
+    hist.SetDirectory(0)
+    return hist
+
+
+def _fill_file_arrays(path, tree_name, expression, cut, weight, binning) -> dict:
+    """
+    Worker task of fill_from_files(): fills one file single-threaded (so its sum is
+    deterministic) and returns copies of the contents, sumw2, entries and the number
+    of events read.
+    """
+    df = ROOT.RDataFrame(tree_name, path)
+    n_events = df.Count()
+    node = (df.Filter(cut) if cut != "" else df).Define("_pa_x", expression)
+    model = ROOT.RDF.TH1DModel(_th1d_from_binning("_pa_model", "", binning))
+    if weight != "":
+        result = node.Define("_pa_w", weight).Histo1D(model, "_pa_x", "_pa_w")
+    else:
+        result = node.Histo1D(model, "_pa_x")
+
+    hist = result.GetValue()
+    return {
+        "contents" : np.array(_contents_view(hist)),
+        "sumw2"    : np.array(_sumw2_view(hist)),
+        "entries"  : hist.GetEntries(),
+        "events"   : n_events.GetValue()
+    }
+
+
+def _tree_reduce(parts):
+    """
+    Pairwise sum in a fixed order, ((p0 + p1) + (p2 + p3)) + ..., so floating-point
+    results do not depend on which worker finished first.
+    """
+    parts = list(parts)
+    while len(parts) > 1:
+        merged = [parts[i] + parts[i + 1] for i in range(0, len(parts) - 1, 2)]
+        if len(parts) % 2:
+            merged.append(parts[-1])
+        parts = merged
+    return parts[0]
+
+
+class HistogramCache:
+    """
+    Persistent on-disk cache of filled histograms. Each entry (bin contents, sumw2
+    and entries, stored as .npz) is keyed on the identity of the input files
+    (path, size, mtime, optionally a SHA-256 checksum), the tree, expression, cut,
+    weight and binning. The cache is bounded to 'max_bytes' with LRU eviction.
+
+        cache = HistogramCache("~/.cache/plotting-assistant", max_bytes=2 * 1024**3)
+        plot.set_histogram_cache(cache)
+        plot.fill_from_file(...)   # reruns with unchanged inputs skip the event loop
+    """
+
+    def __init__(self, directory, max_bytes = 2 * 1024**3, checksum = False):
+        self.directory = os.path.expanduser(directory)
+        self.max_bytes = max_bytes
+        self.checksum = checksum
+        self._checksums = {}
+        os.makedirs(self.directory, exist_ok = True)
+
+    def _file_identity(self, path) -> list:
+        identity = _file_stat_identity(path)
+        if self.checksum:
+            if tuple(identity) not in self._checksums:
+                digest = hashlib.sha256()
+                with open(path, "rb") as f:
+                    for block in iter(lambda: f.read(1 << 20), b""):
+                        digest.update(block)
+                self._checksums[tuple(identity)] = digest.hexdigest()
+            identity.append(self._checksums[tuple(identity)])
+        return identity
+
+    def key(self, root_file_path, tree_name, expression, cut, weight, binning) -> str:
+        payload = json.dumps({
+            "files"      : [self._file_identity(path) for path in _expand_inputs(root_file_path)],
+            "tree"       : tree_name,
+            "expression" : expression,
+            "cut"        : cut,
+            "weight"     : weight,
+            "binning"    : binning
+        }, sort_keys = True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def get(self, key):
+        """Returns {"contents", "sumw2", "entries"} or None on a miss."""
+        path = self._path(key)
+        try:
+            with np.load(path) as cached:
+                entry = {
+                    "contents" : cached["contents"],
+                    "sumw2"    : cached["sumw2"],
+                    "entries"  : float(cached["entries"])
+                }
+            os.utime(path) # most recently used
+            return entry
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def put(self, key, contents, sumw2, entries) -> None:
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, contents = contents, sumw2 = sumw2, entries = entries)
+        os.replace(tmp_path, path) # atomic, safe with concurrent jobs
+        self._evict(keep = os.path.basename(path))
+
+    def _evict(self, keep = None) -> None:
+        """
+        Removes least recently used entries until the cache fits in max_bytes.
+        'keep' (the file just written) is never removed, even if it alone exceeds it.
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".npz") or name == keep:
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        if keep is not None:
+            try:
+                total += os.stat(os.path.join(self.directory, keep)).st_size
+            except OSError:
+                pass
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self) -> None:
+        for name in os.listdir(self.directory):
+            if name.endswith(".npz"):
+                os.remove(os.path.join(self.directory, name))
+
+
+# ROOT::RCompressionSetting::EAlgorithm codes
+_COMPRESSION_ALGORITHMS = {"zlib" : 1, "lzma" : 2, "lz4" : 4, "zstd" : 5}
+
+
+class HistogramWriter:
+    """
+    ROOT output file kept open across many save_histograms() calls, so a whole job
+    writes hundreds of plots into one file (in per-plot subdirectories) without
+    reopening it:
+
+        with HistogramWriter("histograms.root", mode="RECREATE", compression="zstd", level=5) as writer:
+            for region, plot in plots.items():
+                plot.save_histograms(writer=writer, directory=region, by_role=True)
+
+    mode:        TFile option, "UPDATE" (default) appends to an existing file
+    compression: "zlib", "lzma", "lz4", "zstd" (or a ROOT algorithm code), None keeps ROOT's default
+    level:       compression level 0-9, None keeps ROOT's default
+    """
+
+    def __init__(self, path, mode = "UPDATE", compression = None, level = None):
+        self.path = path
+        self.file = ROOT.TFile.Open(path, mode)
+        if not self.file or self.file.IsZombie():
+            raise OSError(f"Could not open '{path}' with mode '{mode}'")
+        if compression is not None:
+            algorithm = _COMPRESSION_ALGORITHMS.get(compression, compression)
+            if not isinstance(algorithm, int):
+                raise ValueError(f"Unknown compression '{compression}', use one of {sorted(_COMPRESSION_ALGORITHMS)}")
+            self.file.SetCompressionAlgorithm(algorithm)
+        if level is not None:
+            self.file.SetCompressionLevel(level)
+        self.n_written = 0
+
+    def directory(self, path = ""):
+        """The (created if missing) subdirectory 'path' ('a/b/c') of the file."""
+        directory = self.file
+        for part in [part for part in path.split("/") if part != ""]:
+            directory = directory.GetDirectory(part) or directory.mkdir(part)
+        return directory
+
+    def write(self, items) -> int:
+        """
+        Writes (directory, name, object) items in one pass, grouped by directory.
+        Existing keys with the same name are replaced (no ';2' cycles in UPDATE mode).
+        Returns the number of objects written.
+        """
+        grouped = {}
+        for path, name, obj in items:
+            grouped.setdefault(path, []).append((name, obj))
+
+        written = 0
+        for path, objects in grouped.items():
+            directory = self.directory(path)
+            for name, obj in objects:
+                if directory.WriteTObject(obj, name, "Overwrite") > 0:
+                    written += 1
+        self.n_written += written
+        return written
+
+    def close(self) -> None:
+        if self.file:
+            self.file.Close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class HistogramStore:
+    """
+    Read-only, memory-mapped store of many histograms in one file: contents, sumw2
+    and bin edges (float64) plus name, title, role, weight, legend and entries.
+    Opening a store maps the file; the arrays are views into the mapping, so many
+    processes on one node share a single copy through the page cache.
+
+        plot.export_store("histograms.store")
+        other = PlottingAssistant(x_title="HT", units="GeV", n_bins=25, x_range=[400, 3000])
+        other.attach_store("histograms.store")   # no copies until drawing
+
+    Layout: 8-byte magic, uint64 header length, JSON header (offsets in float64
+    elements), padding to 64 bytes, float64 data.
+    """
+
+    MAGIC = b"PAHSTOR1"
+    ALIGN = 64
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            if f.read(8) != self.MAGIC:
+                raise ValueError(f"'{path}' is not a histogram store")
+            header_size = int.from_bytes(f.read(8), "little")
+            self.header = json.loads(f.read(header_size).decode())
+
+        offset = self._data_offset(header_size)
+        n_values = self.header["n_values"]
+        if n_values > 0:
+            self._data = np.memmap(path, dtype = "<f8", mode = "r", offset = offset, shape = (n_values,))
+        else:
+            self._data = np.empty(0)
+        self._index = {entry["name"] : entry for entry in self.header["histograms"]}
+
+    @classmethod
+    def _data_offset(cls, header_size) -> int:
+        return -(-(16 + header_size) // cls.ALIGN) * cls.ALIGN
+
+    @classmethod
+    def write(cls, path, entries) -> None:
+        """
+        Writes a store from dicts with "name", "contents", "sumw2", "edges" and optional
+        "title", "role", "weight", "legend", "entries". Replaces 'path' atomically.
+        """
+        histograms, arrays, n_values = [], [], 0
+        for entry in entries:
+            record = {
+                "name"    : entry["name"],
+                "title"   : entry.get("title", ""),
+                "role"    : entry.get("role", ""),
+                "weight"  : float(entry.get("weight", 1.0)),
+                "legend"  : entry.get("legend", ""),
+                "entries" : float(entry.get("entries", 0.0))
+            }
+            for key in ("contents", "sumw2", "edges"):
+                array = np.ascontiguousarray(entry[key], dtype = "<f8").ravel()
+                record[key] = [n_values, int(array.size)]
+                arrays.append(array)
+                n_values += array.size
+            histograms.append(record)
+
+        names = [record["name"] for record in histograms]
+        if len(set(names)) != len(names):
+            raise ValueError("Histogram names in a store must be unique")
+
+        header = json.dumps({"version" : 1, "n_values" : n_values, "histograms" : histograms}).encode()
+        padding = cls._data_offset(len(header)) - 16 - len(header)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(cls.MAGIC)
+            f.write(len(header).to_bytes(8, "little"))
+            f.write(header)
+            f.write(b"\0" * padding)
+            for array in arrays:
+                array.tofile(f)
+        os.replace(tmp_path, path)
+
+    def names(self) -> list:
+        return list(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, name) -> bool:
+        return name in self._index
+
+    def __getitem__(self, name) -> dict:
+        """Metadata of 'name' with "contents", "sumw2" and "edges" as read-only views."""
+        entry = dict(self._index[name])
+        for key in ("contents", "sumw2", "edges"):
+            start, size = entry[key]
+            entry[key] = self._data[start:start+size]
+        return entry
+
+    def histogram(self, name):
+        """A TH1D (a copy, owned by Python) of 'name'."""
+        entry = self[name]
+        hist = _th1d_from_binning(name, entry["title"], _binning_from_edges(entry["edges"]))
+        hist.Sumw2()
+        _contents_view(hist)[:] = entry["contents"]
+        _sumw2_view(hist)[:] = entry["sumw2"]
+        hist.ResetStats()
+        hist.SetEntries(entry["entries"])
+        return hist
+
+    def close(self) -> None:
+        """Drops this object's mapping (views handed out keep theirs alive)."""
+        self._data = np.empty(0)
+        self._index = {}
+
+
+class FillPlan:
+    """
+    Shared fill plan for one input: histograms registered by many PlottingAssistant
+    instances (one per variable) are all filled by a single lazy RDataFrame event
+    loop, so the tree is read and decompressed only once.
+
+        plan = FillPlan("ttbar.root", "Events")
+        plan.add(plot_ht, "HT", role="background", legend="t#bar{t}")
+        plan.add(plot_met, "MET", role="background", legend="t#bar{t}")
+        plan.run()
+    """
+
+    def __init__(self, root_file_path, tree_name, n_threads = 0):
+        self.root_file_path = root_file_path
+        self.tree_name = tree_name
+        self.n_threads = n_threads
+        self.entries = []
+        self.log = Log(True)
+
+    def add(self, assistant, expression,
+        cut         = "",
+        weight      = "",
+        role        = "background",
+        legend      = "",
+        hist_name   = "",
+        scale       = 1.0,
+        show_legend = None ) -> None:
+        """
+        Registers one histogram. 'role' is 'signal', 'background' or 'data'; a legend
+        entry is added when 'legend' is given (or 'show_legend' is forced).
+        """
+        flags = _role_flags(role)
+        self.entries.append({
+            "assistant"   : assistant,
+            "expression"  : expression,
+            "cut"         : cut,
+            "weight"      : weight,
+            "flags"       : flags,
+            "legend"      : legend,
+            "show_legend" : bool(legend) if show_legend is None else show_legend,
+            "hist_name"   : hist_name if hist_name != "" else assistant._default_hist_name(),
+            "scale"       : scale
+        })
+
+    def run(self) -> list:
+        """
+        Runs the event loop once and appends every filled histogram to its assistant.
+        Returns the filled TH1Ds in registration order.
+        """
+        if self.entries == []:
+            self.log.err_msg("The fill plan has no registered histograms.")
+            return []
+
+        self.log.proc_title("Filling %d Histogram(s) From '%s'", len(self.entries), self.root_file_path)
+        inputs = _expand_inputs(self.root_file_path)
+
+        # Cached histograms (keyed on input identity, selection and binning) skip the loop
+        hists = [None] * len(self.entries)
+        keys = [None] * len(self.entries)
+        for idx, entry in enumerate(self.entries):
+            cache = entry["assistant"].histogram_cache
+            if cache is None:
+                continue
+            try:
+                keys[idx] = cache.key(inputs, self.tree_name, entry["expression"], entry["cut"],
+                                      entry["weight"], entry["assistant"].binning_key())
+            except OSError as e:
+                self.log.err_msg("Could not build the cache key of '%s': %s", entry["hist_name"], e)
+                continue
+            cached = cache.get(keys[idx])
+            if cached is not None:
+                hists[idx] = entry["assistant"]._histogram_from_arrays(entry["hist_name"],
+                    cached["contents"], cached["sumw2"], cached["entries"])
+        n_cached = sum(hist is not None for hist in hists)
+        if n_cached:
+            self.log.msg("%d of %d histogram(s) loaded from the cache.", n_cached, len(self.entries))
+
+        missing = [idx for idx, hist in enumerate(hists) if hist is None]
+        if missing:
+            enable_multithreading(self.n_threads)
+            df = ROOT.RDataFrame(self.tree_name, self.root_file_path)
+            n_events = df.Count()
+
+            # Book everything lazily, sharing one filter node per distinct cut
+            filtered = {}
+            results = {}
+            for idx in missing:
+                entry = self.entries[idx]
+                cut = entry["cut"]
+                if cut not in filtered:
+                    filtered[cut] = df.Filter(cut) if cut != "" else df
+                node = filtered[cut].Define(f"_pa_x{idx}", entry["expression"])
+                model = entry["assistant"].histogram_model(entry["hist_name"])
+                if entry["weight"] != "":
+                    node = node.Define(f"_pa_w{idx}", entry["weight"])
+                    results[idx] = node.Histo1D(model, f"_pa_x{idx}", f"_pa_w{idx}")
+                else:
+                    results[idx] = node.Histo1D(model, f"_pa_x{idx}")
+
+            # The first GetValue() triggers the single event loop for all results
+            start = time.perf_counter()
+            n_processed = n_events.GetValue()
+            elapsed = time.perf_counter() - start
+
+            n_workers = ROOT.GetThreadPoolSize() if ROOT.IsImplicitMTEnabled() else 1
+            rate = n_processed / elapsed if elapsed > 0 else float("inf")
+            self.log.msg("Processed %d events in %.2f s on %d thread(s): %.0f events/s.", n_processed, elapsed, n_workers, rate)
+
+            for idx, result in results.items():
+                entry = self.entries[idx]
+                hist = result.GetValue().Clone(entry["hist_name"])
+                hist.SetDirectory(0)
+                hists[idx] = hist
+                if keys[idx] is not None:
+                    entry["assistant"].histogram_cache.put(keys[idx],
+                        _contents_view(hist), _sumw2_view(hist), hist.GetEntries())
+
+        for entry, hist in zip(self.entries, hists):
+            entry["assistant"].input_files.extend(inputs)
+            entry["assistant"].append_histogram(hist,
+                weight      = entry["scale"],
+                show_legend = entry["show_legend"],
+                legend_name = entry["legend"],
+                **entry["flags"])
+
+        return hists
+
+
+_export_pool = None
+
+def _get_export_pool(n_workers):
+    """Process pool shared by all assistants for parallel format export."""
+    global _export_pool
+    if _export_pool is None or _export_pool._max_workers != n_workers:
+        if _export_pool is not None:
+            _export_pool.shutdown()
+        context = multiprocessing.get_context("spawn")
+        _export_pool = ProcessPoolExecutor(max_workers = n_workers, mp_context = context,
+                                           initializer = _init_render_worker)
+    return _export_pool
+
+
+def _export_canvas(payload, target) -> tuple:
+    """
+    Worker side of the parallel export: rebuilds the serialised canvas and saves
+    one format. Returns (target, wall time, CPU time).
+    """
+    wall, cpu = time.perf_counter(), time.process_time()
+    canvas = pickle.loads(payload)
+    canvas.SaveAs(target)
+    return target, time.perf_counter() - wall, time.process_time() - cpu
+
+
+_open_stores = {}
+
+def _load_spec_histogram(item):
+    """Returns the TH1 of a plot-spec histogram entry (object, arrays, store or 'file' + 'name')."""
+    if item.get("hist") is not None:
+        return item["hist"]
+
+    if item.get("store") is not None:
+        # one mapping per store and process, shared by every plot rendered here
+        if item["store"] not in _open_stores:
+            _open_stores[item["store"]] = HistogramStore(item["store"])
+        hist = _open_stores[item["store"]].histogram(item.get("store_name", item["name"]))
+        hist.SetName(item["name"])
+        if item.get("title"):
+            hist.SetTitle(item["title"])
+        return hist
+
+    if item.get("contents") is not None:
+        hist = _th1d_from_binning(item.get("name", "h"), item.get("title", ""), item["binning"])
+        hist.Sumw2()
+        _contents_view(hist)[:] = item["contents"]
+        _sumw2_view(hist)[:] = item["sumw2"]
+        hist.ResetStats()
+        hist.SetEntries(item.get("entries", 0.0))
+        return hist
+
+    root_file = ROOT.TFile.Open(item["file"])
+    if not root_file or root_file.IsZombie():
+        raise OSError(f"Could not open '{item['file']}'")
+    hist = root_file.Get(item["name"])
+    if not hist:
+        raise KeyError(f"No histogram '{item['name']}' in '{item['file']}'")
+    hist.SetDirectory(0)
+    root_file.Close()
+    return hist
+
+
+def _render_spec(spec) -> dict:
+    """Renders one plot specification (see render_batch()) and reports the outcome."""
+    start = time.perf_counter()
+    output = spec.get("output", "")
+    try:
+        plot = PlottingAssistant(
+            x_title   = spec.get("x_title", ""),
+            units     = spec.get("units", ""),
+            y_title   = spec.get("y_title", "Events"),
+            n_bins    = spec.get("n_bins", 25),
+            x_range   = spec.get("x_range"),
+            bin_edges = spec.get("bin_edges"),
+            log_level = Log.INFO if spec.get("verbose", False) else Log.WARN
+        )
+        plot.stack_in_order(spec.get("stack_in_order", True))
+
+        for item in spec.get("histograms", []):
+            hist = _load_spec_histogram(item)
+            if item.get("style"):
+                plot.design_histogram(hist, **item["style"])
+            legend = item.get("legend", "")
+            plot.append_histogram(hist,
+                weight      = item.get("weight", 1.0),
+                show_legend = legend != "",
+                legend_name = legend,
+                **_role_flags(item.get("role", "background")))
+
+        for label in spec.get("labels", []):
+            plot.add_label(**label)
+        plot.set_logy(spec.get("logy", False))
+
+        formats = spec.get("formats") or plot.save_formats
+        plot.draw_plot(output, formats)
+
+        if os.path.splitext(output)[1]:
+            expected = [output]
+        else:
+            expected = [f"{output}.{fmt}" for fmt in formats]
+        missing = [path for path in expected if not os.path.exists(path)]
+        plot.clean_memory()
+
+        if missing:
+            return {"output": output, "ok": False, "error": f"Not written: {', '.join(missing)}",
+                    "seconds": time.perf_counter() - start}
+        return {"output": output, "ok": True, "error": "", "seconds": time.perf_counter() - start}
+
+    except Exception:
+        return {"output": output, "ok": False, "error": traceback.format_exc(),
+                "seconds": time.perf_counter() - start}
+
+
+def _init_render_worker() -> None:
+    # once per worker process: batch mode and the global style
+    apply_global_style()
+
+
+def render_batch(specs, n_workers = None) -> list:
+    """
+    Renders many plots across a pool of worker processes (default: one per core).
+    Each worker is initialised once with the global style and batch mode.
+
+    Each spec is a dict:
+        output          : plot name passed to draw_plot() (required)
+        formats         : list of formats (default ["pdf"])
+        x_title, units, y_title, n_bins, x_range, bin_edges : PlottingAssistant arguments
+        histograms      : list of {"hist": TH1}, {"file": path, "name": key}, store
+                          {"store": path, "name", "store_name"} (see HistogramStore) or array
+                          {"name", "binning", "contents", "sumw2", "entries"} entries
+                          (binning as PlottingAssistant.binning_key()), with optional "weight", "role" ('signal', 'background', 'data'),
+                          "legend" and "style" (design_histogram() keyword arguments)
+        labels          : list of add_label() keyword dicts
+        logy, stack_in_order, verbose : optional switches
+
+    Returns one {"output", "ok", "error", "seconds"} dict per spec, in input order;
+    a failing plot never stops the others.
+    """
+    results = [None] * len(specs)
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers = n_workers, mp_context = context,
+                             initializer = _init_render_worker) as pool:
+        futures = {pool.submit(_render_spec, spec) : idx for idx, spec in enumerate(specs)}
+        for future in as_completed(futures):
+            idx = futures[future]
+            try:
+                results[idx] = future.result()
+            except Exception:
+                # e.g. a worker process that crashed inside ROOT
+                results[idx] = {"output": specs[idx].get("output", ""), "ok": False,
+                                "error": traceback.format_exc(), "seconds": 0.0}
+    return results
+
+
+## Batch command-line interface
+## python EventsFillerClass.py plots.yaml [-j N] [--force] [--dry-run] [--only NAME ...]
+
+def _resolve(base_dir, path) -> str:
+    """'path' (with ~ expanded) relative to 'base_dir' unless it is absolute."""
+    path = os.path.expanduser(path)
+    return path if os.path.isabs(path) else os.path.join(base_dir, path)
+
+
+def _stable_hash(obj) -> str:
+    return hashlib.sha256(json.dumps(obj, sort_keys = True).encode()).hexdigest()
+
+
+def load_manifest(path) -> dict:
+    """
+    Reads and checks a plot manifest: JSON, or YAML ('.yaml' / '.yml', needs PyYAML).
+    See the README for the format: global "output_dir", "formats", "tree", "cache_dir"
+    and "labels"; "samples" by name (files, role, weight, scale, legend, cut, style);
+    "plots" (name, expression, samples, binning, cut, titles, labels, logy, formats).
+    """
+    with open(path) as f:
+        if path.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("Reading a YAML manifest needs PyYAML (pip install pyyaml); JSON works without it.")
+            manifest = yaml.safe_load(f)
+        else:
+            manifest = json.load(f)
+
+    if not isinstance(manifest, dict) or not isinstance(manifest.get("samples"), dict) \
+            or not isinstance(manifest.get("plots"), list):
+        raise ValueError(f"'{path}' needs a 'samples' mapping and a 'plots' list")
+    for name, sample in manifest["samples"].items():
+        if "files" not in sample:
+            raise ValueError(f"Sample '{name}' has no 'files'")
+        _role_flags(sample.get("role", "background"))
+    names = set()
+    for idx, plot in enumerate(manifest["plots"]):
+        missing = {"name", "expression", "samples"} - set(plot)
+        if missing:
+            raise ValueError(f"Plot {idx} misses {sorted(missing)}")
+        if "bin_edges" not in plot and "x_range" not in plot:
+            raise ValueError(f"Plot '{plot['name']}' needs 'x_range' (with 'n_bins') or 'bin_edges'")
+        unknown = [name for name in plot["samples"] if name not in manifest["samples"]]
+        if unknown:
+            raise ValueError(f"Plot '{plot['name']}' uses unknown samples {unknown}")
+        if plot["name"] in names:
+            raise ValueError(f"Plot name '{plot['name']}' is used twice")
+        names.add(plot["name"])
+    return manifest
+
+
+def _plot_binning(plot):
+    """PlottingAssistant.binning_key() of a manifest plot."""
+    if "bin_edges" in plot:
+        return {"edges" : [float(edge) for edge in plot["bin_edges"]]}
+    return [int(plot.get("n_bins", 25)), float(plot["x_range"][0]), float(plot["x_range"][1])]
+
+
+def build_manifest_graph(manifest, base_dir = ".") -> dict:
+    """
+    Dependency graph of a manifest: input files -> filled histograms -> plots.
+        histograms: {key: {"sample", "files", "tree", "expression", "cut", "weight",
+                    "binning", "hash"}}, one node per distinct fill (shared by plots);
+                    the hash covers the fill and the input file identities (path, size, mtime)
+        plots:      {name: {"config", "histograms", "hash"}}, histogram keys in sample
+                    order; the hash covers the histogram hashes and the plot and sample settings
+    """
+    samples = manifest["samples"]
+    sample_files = {}
+    identities = {}
+    histograms = {}
+    plots = {}
+
+    for plot in manifest["plots"]:
+        binning = _plot_binning(plot)
+        keys = []
+        for sample_name in plot["samples"]:
+            sample = samples[sample_name]
+            if sample_name not in sample_files:
+                patterns = sample["files"] if isinstance(sample["files"], list) else [sample["files"]]
+                files = _expand_inputs([_resolve(base_dir, pattern) for pattern in patterns])
+                if files == []:
+                    raise FileNotFoundError(f"Sample '{sample_name}' matches no input files")
+                for path in files:
+                    identities[path] = _file_stat_identity(path)
+                sample_files[sample_name] = files
+
+            cut = " && ".join(f"({cut})" for cut in (plot.get("cut", ""), sample.get("cut", "")) if cut)
+            fill = {
+                "sample"     : sample_name,
+                "files"      : sample_files[sample_name],
+                "tree"       : sample.get("tree", plot.get("tree", manifest.get("tree", "Events"))),
+                "expression" : plot["expression"],
+                "cut"        : cut,
+                "weight"     : sample.get("weight", ""),
+                "binning"    : binning
+            }
+            key = _stable_hash(fill)
+            if key not in histograms:
+                fill["hash"] = _stable_hash([key, [identities[path] for path in fill["files"]]])
+                histograms[key] = fill
+            keys.append(key)
+
+        settings = {
+            "plot"    : plot,
+            "samples" : {name : samples[name] for name in plot["samples"]},
+            "formats" : plot.get("formats", manifest.get("formats", ["pdf"])),
+            "labels"  : plot.get("labels", manifest.get("labels", []))
+        }
+        plots[plot["name"]] = {
+            "config"     : plot,
+            "histograms" : keys,
+            "hash"       : _stable_hash([settings, [histograms[key]["hash"] for key in keys]])
+        }
+
+    return {"histograms" : histograms, "plots" : plots}
+
+
+def _bin_edges_of_binning(binning):
+    """Edge array of a PlottingAssistant.binning_key()."""
+    if isinstance(binning, dict):
+        return np.asarray(binning["edges"], dtype = np.float64)
+    n_bins, x_min, x_max = binning
+    return np.linspace(x_min, x_max, n_bins + 1)
+
+
+def _assistant_for_binning(binning, log_level = None):
+    if isinstance(binning, dict):
+        return PlottingAssistant(bin_edges = binning["edges"], log_level = log_level)
+    n_bins, x_min, x_max = binning
+    return PlottingAssistant(n_bins = n_bins, x_range = [x_min, x_max], log_level = log_level)
+
+
+def _fill_histogram_group(task) -> dict:
+    """
+    Worker task of run_manifest(): fills every histogram node of one input (files and
+    tree) with a single FillPlan event loop, through the histogram cache when one is
+    configured, and returns {key: {"contents", "sumw2", "entries"}}.
+    """
+    cache = HistogramCache(task["cache_dir"]) if task["cache_dir"] else None
+    plan = FillPlan(task["files"], task["tree"], n_threads = task["n_threads"])
+    plan.log.level = Log.WARN
+    for node in task["nodes"]:
+        assistant = _assistant_for_binning(node["binning"], log_level = Log.WARN)
+        assistant.set_histogram_cache(cache)
+        plan.add(assistant, node["expression"], cut = node["cut"], weight = node["weight"],
+                 hist_name = f"h_{node['key'][:16]}")
+
+    return {
+        node["key"] : {
+            "contents" : np.array(_contents_view(hist)),
+            "sumw2"    : np.array(_sumw2_view(hist)),
+            "entries"  : hist.GetEntries()
+        }
+        for node, hist in zip(task["nodes"], plan.run())
+    }
+
+
+def _plot_spec(manifest, graph, name, store_path, output_dir) -> dict:
+    """render_batch() spec of one manifest plot, its histograms read from the store at 'store_path'."""
+    plot = graph["plots"][name]["config"]
+    units = plot.get("units", "")
+    x_title = plot.get("x_title", plot["expression"])
+    title = f";{x_title} [{units}];{plot.get('y_title', 'Events')}" if units else f";{x_title};{plot.get('y_title', 'Events')}"
+
+    spec = {
+        "output"         : os.path.join(output_dir, name),
+        "formats"        : plot.get("formats", manifest.get("formats", ["pdf"])),
+        "x_title"        : x_title,
+        "units"          : units,
+        "y_title"        : plot.get("y_title", "Events"),
+        "labels"         : plot.get("labels", manifest.get("labels", [])),
+        "logy"           : plot.get("logy", False),
+        "stack_in_order" : plot.get("stack_in_order", True),
+        "histograms"     : []
+    }
+    if "bin_edges" in plot:
+        spec["bin_edges"] = plot["bin_edges"]
+    else:
+        spec["n_bins"], spec["x_range"] = int(plot.get("n_bins", 25)), list(plot["x_range"])
+
+    for sample_name, key in zip(plot["samples"], graph["plots"][name]["histograms"]):
+        sample = manifest["samples"][sample_name]
+        spec["histograms"].append({
+            "name"       : sample_name,
+            "title"      : title,
+            "store"      : store_path,
+            "store_name" : key,
+            "weight"     : sample.get("scale", 1.0),
+            "role"       : sample.get("role", "background"),
+            "legend"     : sample.get("legend", ""),
+            "style"      : sample.get("style")
+        })
+    return spec
+
+
+def run_manifest(manifest, base_dir = ".", n_workers = None, force = False, dry_run = False,
+                 only = None, state_path = None) -> dict:
+    """
+    Builds the plots of a manifest incrementally. A plot is rebuilt when its hash
+    (inputs and configuration, see build_manifest_graph()) differs from the one in the
+    state file, or an output is missing. The histograms the stale plots need are
+    filled first, one FillPlan per input spread over 'n_workers' processes (default:
+    one per core), then the plots are rendered with render_batch().
+    Returns {"rebuilt": [...], "up_to_date": [...], "failed": {name: error}}.
+    """
+    log = Log(True)
+    n_workers = n_workers or os.cpu_count() or 1
+    graph = build_manifest_graph(manifest, base_dir)
+    output_dir = _resolve(base_dir, manifest.get("output_dir", "plots"))
+    state_path = state_path or os.path.join(output_dir, ".plotting_assistant_state.json")
+    cache_dir = _resolve(base_dir, manifest["cache_dir"]) if manifest.get("cache_dir") else ""
+
+    state = {}
+    if os.path.exists(state_path):
+        with open(state_path) as f:
+            state = json.load(f)
+
+    stale, up_to_date = [], []
+    for name, node in graph["plots"].items():
+        if only and name not in only:
+            continue
+        formats = node["config"].get("formats", manifest.get("formats", ["pdf"]))
+        outputs = [os.path.join(output_dir, f"{name}.{fmt}") for fmt in formats]
+        if force or state.get(name) != node["hash"] or not all(os.path.exists(path) for path in outputs):
+            stale.append(name)
+        else:
+            up_to_date.append(name)
+
+    log.title("Manifest: %d plot(s) to rebuild, %d up to date.", len(stale), len(up_to_date))
+    summary = {"rebuilt" : [], "up_to_date" : up_to_date, "failed" : {}}
+    if dry_run or stale == []:
+        for name in stale:
+            log.msg("would rebuild '%s'", name)
+        return summary
+
+    # filled histograms needed by the stale plots, grouped by input so that each
+    # input is read by one event loop
+    groups = {}
+    for name in stale:
+        for key in graph["plots"][name]["histograms"]:
+            node = graph["histograms"][key]
+            group = groups.setdefault((tuple(node["files"]), node["tree"]), {})
+            group[key] = dict(node, key = key)
+    tasks = [{
+        "files"     : list(files),
+        "tree"      : tree,
+        "cache_dir" : cache_dir,
+        "n_threads" : max(1, n_workers // len(groups)),
+        "nodes"     : list(nodes.values())
+    } for (files, tree), nodes in groups.items()]
+
+    log.proc_title("Filling %d Histogram(s) From %d Input(s)", sum(len(task["nodes"]) for task in tasks), len(tasks))
+    arrays, fill_errors = {}, {}
+    if n_workers == 1 or len(tasks) == 1:
+        for task in tasks:
+            try:
+                arrays.update(_fill_histogram_group(task))
+            except Exception:
+                fill_errors.update({node["key"] : traceback.format_exc() for node in task["nodes"]})
+    else:
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers = min(n_workers, len(tasks)), mp_context = context) as pool:
+            futures = {pool.submit(_fill_histogram_group, task) : task for task in tasks}
+            for future in as_completed(futures):
+                try:
+                    arrays.update(future.result())
+                except Exception:
+                    fill_errors.update({node["key"] : traceback.format_exc() for node in futures[future]["nodes"]})
+
+    # the render workers map one shared store instead of receiving pickled arrays
+    os.makedirs(output_dir, exist_ok = True)
+    store_path = os.path.join(output_dir, ".plotting_assistant_histograms.store")
+    HistogramStore.write(store_path, [
+        dict(values, name = key, edges = _bin_edges_of_binning(graph["histograms"][key]["binning"]))
+        for key, values in arrays.items()
+    ])
+
+    specs = []
+    for name in stale:
+        errors = [fill_errors[key] for key in graph["plots"][name]["histograms"] if key in fill_errors]
+        if errors:
+            summary["failed"][name] = errors[0]
+        else:
+            specs.append((name, _plot_spec(manifest, graph, name, store_path, output_dir)))
+
+    log.proc_title("Rendering %d Plot(s)", len(specs))
+    results = render_batch([spec for _, spec in specs], n_workers) if specs else []
+    for (name, _), result in zip(specs, results):
+        if result["ok"]:
+            state[name] = graph["plots"][name]["hash"]
+            summary["rebuilt"].append(name)
+            log.msg("'%s' rebuilt in %.2f s.", name, result["seconds"])
+        else:
+            summary["failed"][name] = result["error"]
+    for name, error in summary["failed"].items():
+        state.pop(name, None)
+        log.err_msg("'%s' failed:\n%s", name, error)
+
+    tmp_path = f"{state_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent = 2, sort_keys = True)
+    os.replace(tmp_path, state_path)
+
+    log.msg("%d rebuilt, %d up to date, %d failed.", len(summary["rebuilt"]), len(up_to_date), len(summary["failed"]))
+    return summary
+
+
+def main(argv = None) -> int:
+    import argparse
+    parser = argparse.ArgumentParser(description = "Builds the plots of a manifest, rebuilding only what changed.")
+    parser.add_argument("manifest", help = "plot manifest (.json, or .yaml/.yml with PyYAML)")
+    parser.add_argument("-j", "--workers", type = int, default = None, help = "worker processes (default: one per core)")
+    parser.add_argument("--force", action = "store_true", help = "rebuild every plot")
+    parser.add_argument("--dry-run", action = "store_true", help = "only list the plots that would be rebuilt")
+    parser.add_argument("--only", nargs = "+", default = None, help = "restrict to these plot names")
+    parser.add_argument("--state", default = None, help = "state file (default: <output_dir>/.plotting_assistant_state.json)")
+    args = parser.parse_args(argv)
+
+    manifest = load_manifest(args.manifest)
+    summary = run_manifest(manifest,
+        base_dir   = os.path.dirname(os.path.abspath(args.manifest)),
+        n_workers  = args.workers,
+        force      = args.force,
+        dry_run    = args.dry_run,
+        only       = args.only,
+        state_path = args.state)
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
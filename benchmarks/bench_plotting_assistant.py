@@ -0,0 +1,173 @@
+## -------------------------------------------------------------------------- ##
+##    Benchmark suite for PlottingAssistant                                   ##
+## -------------------------------------------------------------------------- ##
+##    Builds many sequential plots from synthetic TH1Ds and measures          ##
+##    plots/second, per-stage latency and memory growth. Runs headless.       ##
+##                                                                            ##
+##    python benchmarks/bench_plotting_assistant.py --plots 200 \             ##
+##           --processes 15 --bins 100 --nuisances 50 --output new.json       ##
+##    python benchmarks/bench_plotting_assistant.py ... --compare old.json    ##
+##    python benchmarks/bench_plotting_assistant.py --plots 10000 --pool \    ##
+##           --no-profile --max-growth-mb 5   (memory flat over 10,000 plots) ##
+## -------------------------------------------------------------------------- ##
+
+
+import argparse, json, os, platform, sys, tempfile, time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import EventsFillerClass as efc
+
+
+def current_rss_mb() -> float:
+    """Resident set size of this process in MB (Linux /proc, else peak RSS)."""
+    return efc._current_rss_kb() / 1024
+
+
+def make_plot(args, idx, rng, out_dir, pool = None, writer = None) -> None:
+    """One full plot: book + fill synthetic processes, uncertainties, draw, save."""
+    plot = efc.PlottingAssistant(x_title="HT", units="GeV", n_bins=args.bins, x_range=[0, 1000],
+                                 graphics_pool=pool, log_level=efc.Log.OFF)
+    plot.enable_profiling(args.profile)
+
+    for p in range(args.processes):
+        hist = plot.book_histogram(f"h_bkg_{idx}_{p}")
+        values = rng.exponential(150 + 20 * p, args.entries)
+        weights = rng.normal(1.0, 0.1, args.entries)
+        plot.fill_from_arrays(hist, values, weights)
+        plot.append_histogram(hist, weight=1.0, is_background=True, show_legend=True, legend_name=f"bkg {p}")
+
+    for s in range(args.signals):
+        hist = plot.book_histogram(f"h_sig_{idx}_{s}")
+        plot.fill_from_arrays(hist, rng.normal(400 + 100 * s, 50, args.entries // 10))
+        plot.append_histogram(hist, is_signal=True, show_legend=True, legend_name=f"signal {s}")
+
+    if args.nuisances > 0:
+        nuisances = {
+            f"np_{k}" : list(rng.uniform(-0.05, 0.05, args.processes))
+            for k in range(args.nuisances)
+        }
+        plot.set_uncertainties(lumi_frac=0.017, nuisances=nuisances)
+
+    plot.set_logy(idx % 2 == 1)
+    plot.draw_plot(os.path.join(out_dir, f"plot_{idx}"), args.formats)
+    if writer is not None:
+        plot.save_histograms(writer=writer, directory=f"plot_{idx}", by_role=True)
+    elif args.save_histograms:
+        plot.save_histograms(os.path.join(out_dir, f"hists_{idx}.root"), compression=args.compression)
+    plot.clean_memory()
+
+
+def run(args) -> dict:
+    rng = np.random.default_rng(args.seed)
+    pool = efc.GraphicsPool() if args.pool else None
+    efc.reset_job_profile()
+    rss = [current_rss_mb()]
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        writer = None
+        if args.save_histograms and args.single_file:
+            writer = efc.HistogramWriter(os.path.join(out_dir, "hists.root"), mode="RECREATE", compression=args.compression)
+
+        # warm-up plot (imports, style, first canvas) is not measured
+        make_plot(args, -1, rng, out_dir, pool, writer)
+        efc.reset_job_profile()
+
+        start = time.perf_counter()
+        for idx in range(args.plots):
+            make_plot(args, idx, rng, out_dir, pool, writer)
+            rss.append(current_rss_mb())
+        if writer is not None:
+            writer.close()
+        elapsed = time.perf_counter() - start
+
+    report = efc.job_performance_report()
+    growth = np.polyfit(np.arange(len(rss)), rss, 1)[0] * 1000 if len(rss) > 1 else 0.0
+    return {
+        "meta" : {
+            "timestamp"     : time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python"        : platform.python_version(),
+            "root"          : str(efc.ROOT.gROOT.GetVersion()),
+            "numpy"         : np.__version__,
+            "host"          : platform.node(),
+            "parameters"    : vars(args)
+        },
+        "plots_per_second"        : args.plots / elapsed if elapsed > 0 else float("inf"),
+        "seconds"                 : elapsed,
+        "rss_mb"                  : rss,
+        "rss_growth_mb_per_1000"  : growth,
+        "stages"                  : report["stages"]
+    }
+
+
+def compare(result, baseline, threshold) -> list:
+    """Returns the regressions (slower by more than 'threshold') against a baseline result."""
+    regressions = []
+    old, new = baseline["plots_per_second"], result["plots_per_second"]
+    if new < old * (1 - threshold):
+        regressions.append(f"plots/s: {old:.2f} -> {new:.2f}")
+    for stage, stats in result["stages"].items():
+        if stage not in baseline["stages"]:
+            continue
+        old, new = baseline["stages"][stage]["mean_wall"], stats["mean_wall"]
+        if new > old * (1 + threshold):
+            regressions.append(f"{stage}: {old * 1e3:.3f} ms -> {new * 1e3:.3f} ms")
+    old, new = baseline["rss_growth_mb_per_1000"], result["rss_growth_mb_per_1000"]
+    if new > max(old, 0) * (1 + threshold) + 1.0:
+        regressions.append(f"memory growth: {old:.2f} -> {new:.2f} MB / 1000 plots")
+    return regressions
+
+
+def main(argv = None) -> int:
+    parser = argparse.ArgumentParser(description="PlottingAssistant throughput and memory benchmark")
+    parser.add_argument("--plots", type=int, default=50, help="number of sequential assistants/plots")
+    parser.add_argument("--processes", type=int, default=10, help="background processes per plot")
+    parser.add_argument("--signals", type=int, default=2, help="signal overlays per plot")
+    parser.add_argument("--bins", type=int, default=50, help="bins per histogram")
+    parser.add_argument("--nuisances", type=int, default=0, help="named nuisances in the uncertainty band")
+    parser.add_argument("--entries", type=int, default=10000, help="entries filled per background")
+    parser.add_argument("--formats", nargs="+", default=["png"], help="output formats per plot")
+    parser.add_argument("--save-histograms", action="store_true", help="also time save_histograms()")
+    parser.add_argument("--single-file", action="store_true",
+                        help="with --save-histograms, write every plot into one file kept open by a HistogramWriter")
+    parser.add_argument("--compression", default=None, help="compression of the saved histograms (zlib, lzma, lz4, zstd)")
+    parser.add_argument("--pool", action="store_true", help="reuse canvases/legends through a GraphicsPool")
+    parser.add_argument("--no-profile", dest="profile", action="store_false",
+                        help="run without per-stage profiling (memory checks measure only the plots)")
+    parser.add_argument("--max-growth-mb", type=float, default=None,
+                        help="fail if RSS grows by more than this many MB per 1000 plots")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", default="", help="write the JSON result here")
+    parser.add_argument("--compare", default="", help="baseline JSON result to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative slow-down reported as a regression")
+    args = parser.parse_args(argv)
+
+    result = run(args)
+
+    print(f"{result['plots_per_second']:.2f} plots/s over {args.plots} plots, "
+          f"memory growth {result['rss_growth_mb_per_1000']:.2f} MB / 1000 plots")
+    for stage, stats in sorted(result["stages"].items()):
+        print(f"  {stage:<18} {stats['calls']:>7} calls  {stats['mean_wall'] * 1e3:9.3f} ms mean  {stats['max_wall'] * 1e3:9.3f} ms max")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+    status = 0
+    if args.max_growth_mb is not None and result["rss_growth_mb_per_1000"] > args.max_growth_mb:
+        print(f"MEMORY GROWTH {result['rss_growth_mb_per_1000']:.2f} MB / 1000 plots exceeds {args.max_growth_mb} MB")
+        status = 1
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(result, json.load(f), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        status = 1 if regressions else status
+
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+## -------------------------------------------------------------------------- ##
+##    Startup benchmark for PlottingAssistant                                 ##
+## -------------------------------------------------------------------------- ##
+##    Measures the cost short-lived jobs pay before doing any work, each      ##
+##    in a fresh interpreter so that ROOT and the style setup are included:   ##
+##      * cold_construction: import + first assistant (book, fill, append),   ##
+##      * cold_first_draw:   the same + its first draw_plot().                ##
+##    Steady-state per-assistant costs are timed in-process as well:          ##
+##      * construction: book, fill, append and clean, no drawing,             ##
+##      * draw: the same with one draw_plot().                                ##
+##    Only the original PlottingAssistant API is used, so the same script     ##
+##    times older checkouts too (--repo).                                     ##
+##                                                                            ##
+##    python benchmarks/bench_startup.py --output startup.json                ##
+##    python benchmarks/bench_startup.py --repo /path/to/old/checkout \       ##
+##           --output before.json                                             ##
+##    python benchmarks/bench_startup.py --compare before.json                ##
+## -------------------------------------------------------------------------- ##
+
+
+import argparse, contextlib, json, os, platform, subprocess, sys, tempfile, time
+
+import numpy as np
+
+REPO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+STAGES = ("cold_construction", "cold_first_draw", "construction", "draw")
+
+
+def filled_assistant(efc, name, bins, values, weights):
+    """A quiet assistant with one filled background (original API only)."""
+    plot = efc.PlottingAssistant(x_title="HT", units="GeV", n_bins=bins, x_range=[0, 1000])
+    plot.set_verbose_mode(False)
+    hist = plot.book_histogram(name)
+    hist.FillN(len(values), values, weights)
+    plot.append_histogram(hist, is_background=True, show_legend=True, legend_name="bkg")
+    return plot
+
+
+def cold_run(args) -> dict:
+    """
+    Runs in a fresh interpreter (see cold_seconds()): imports the module, builds
+    and draws the first assistant, and returns the time from before the import.
+    """
+    values, weights = np.random.default_rng(args.seed).exponential(200, args.entries), np.ones(args.entries)
+    with open(os.devnull, "w") as null, contextlib.redirect_stdout(null), tempfile.TemporaryDirectory() as out_dir:
+        start = time.perf_counter()
+        sys.path.insert(0, args.repo)
+        import EventsFillerClass as efc
+        plot = filled_assistant(efc, "h_cold", args.bins, values, weights)
+        constructed = time.perf_counter()
+        plot.save_formats = ["png"]
+        plot.draw_plot(os.path.join(out_dir, "cold"))
+        drawn = time.perf_counter()
+    return {"cold_construction" : constructed - start, "cold_first_draw" : drawn - start,
+            "root" : str(efc.ROOT.gROOT.GetVersion())}
+
+
+def cold_seconds(args) -> list:
+    """One cold_run() per fresh interpreter."""
+    runs = []
+    for _ in range(args.cold_runs):
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), "--cold-run",
+                              "--repo", args.repo, "--bins", str(args.bins),
+                              "--entries", str(args.entries), "--seed", str(args.seed)],
+                             capture_output=True, text=True, check=True)
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return runs
+
+
+def construction_seconds(efc, n, bins, entries, rng) -> list:
+    """Construct, book, fill, append and clean assistants that never draw."""
+    times = []
+    values, weights = rng.exponential(200, entries), np.ones(entries)
+    for idx in range(n):
+        start = time.perf_counter()
+        plot = filled_assistant(efc, f"h_startup_{idx}", bins, values, weights)
+        plot.clean_memory()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def draw_seconds(efc, n, bins, entries, rng, out_dir) -> list:
+    """Construct and draw once: includes the canvas, legends and stack."""
+    times = []
+    values, weights = rng.exponential(200, entries), np.ones(entries)
+    for idx in range(n):
+        start = time.perf_counter()
+        plot = filled_assistant(efc, f"h_draw_{idx}", bins, values, weights)
+        plot.save_formats = ["png"]
+        plot.draw_plot(os.path.join(out_dir, f"startup_{idx}"))
+        plot.clean_memory()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def summary(times) -> dict:
+    return {"median" : float(np.median(times)), "min" : float(np.min(times)), "max" : float(np.max(times))}
+
+
+def run(args) -> dict:
+    rng = np.random.default_rng(args.seed)
+    cold = cold_seconds(args)
+    result = {
+        "meta" : {
+            "timestamp"  : time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python"     : platform.python_version(),
+            "numpy"      : np.__version__,
+            "root"       : cold[0]["root"],
+            "host"       : platform.node(),
+            "parameters" : vars(args)
+        },
+        "cold_construction" : summary([c["cold_construction"] for c in cold]),
+        "cold_first_draw"   : summary([c["cold_first_draw"] for c in cold])
+    }
+
+    sys.path.insert(0, args.repo)
+    import EventsFillerClass as efc
+    # log output goes to /dev/null: older checkouts print while constructing
+    with open(os.devnull, "w") as null, contextlib.redirect_stdout(null):
+        # the first assistant of the process is measured by the cold stages above
+        construction_seconds(efc, 1, args.bins, args.entries, rng)
+        result["construction"] = summary(construction_seconds(efc, args.constructions, args.bins, args.entries, rng))
+        with tempfile.TemporaryDirectory() as out_dir:
+            result["draw"] = summary(draw_seconds(efc, args.draws, args.bins, args.entries, rng, out_dir))
+    return result
+
+
+def compare(result, baseline, threshold) -> list:
+    """Returns the stages whose median got slower than the baseline by more than 'threshold'."""
+    regressions = []
+    for stage in STAGES:
+        old, new = baseline[stage]["median"], result[stage]["median"]
+        if new > old * (1 + threshold):
+            regressions.append(f"{stage}: {old * 1e3:.3f} ms -> {new * 1e3:.3f} ms")
+    return regressions
+
+
+def main(argv = None) -> int:
+    parser = argparse.ArgumentParser(description="PlottingAssistant import and construction benchmark")
+    parser.add_argument("--repo", default=REPO, help="checkout whose EventsFillerClass.py is timed")
+    parser.add_argument("--cold-runs", type=int, default=5, help="fresh interpreters timed from import to first draw")
+    parser.add_argument("--constructions", type=int, default=200, help="assistants that never draw")
+    parser.add_argument("--draws", type=int, default=20, help="assistants that draw once")
+    parser.add_argument("--bins", type=int, default=50, help="bins per histogram")
+    parser.add_argument("--entries", type=int, default=1000, help="entries filled per histogram")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", default="", help="write the JSON result here")
+    parser.add_argument("--compare", default="", help="baseline JSON result to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative slow-down reported as a regression")
+    parser.add_argument("--cold-run", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.cold_run:
+        print(json.dumps(cold_run(args)))
+        return 0
+
+    result = run(args)
+    for stage in STAGES:
+        stats = result[stage]
+        print(f"  {stage:<18} {stats['median'] * 1e3:9.3f} ms median  {stats['min'] * 1e3:9.3f} ms min  {stats['max'] * 1e3:9.3f} ms max")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+    status = 0
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(result, json.load(f), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        status = 1 if regressions else status
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+import os, sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import EventsFillerClass as efc
+
+
+def _merge_loop(array, idx):
+    """Reference for _merge_bins(): one bin at a time."""
+    inner = array[1:-1]
+    merged = [array[0] + inner[:idx[0]].sum()]
+    merged += [inner[lo:hi].sum() for lo, hi in zip(idx[:-1], idx[1:])]
+    merged.append(array[-1] + inner[idx[-1]:].sum())
+    return np.array(merged)
+
+
+def test_subdivide_edges():
+    np.testing.assert_allclose(efc._subdivide_edges([0, 1, 3], 2), [0, 0.5, 1, 2, 3])
+    assert len(efc._subdivide_edges(np.linspace(0, 100, 26), 10)) == 251
+
+
+def test_coarse_indices():
+    fine = np.linspace(0, 100, 101)
+    np.testing.assert_array_equal(efc._coarse_indices(fine, [0, 10, 50, 100]), [0, 10, 50, 100])
+    # floating-point noise on the requested edges does not matter
+    np.testing.assert_array_equal(efc._coarse_indices(fine, [1e-12, 30 - 1e-11, 70]), [0, 30, 70])
+    with pytest.raises(ValueError):
+        efc._coarse_indices(fine, [0, 10.5, 20])
+    with pytest.raises(ValueError):
+        efc._coarse_indices(fine, [0, 20, 10])
+
+
+def test_merge_bins_matches_a_loop_and_keeps_the_total():
+    rng = np.random.default_rng(7)
+    array = rng.exponential(5.0, 100 + 2)
+    for idx in ([0, 10, 50, 100], [5, 20, 60], [0, 100], list(range(0, 101, 25))):
+        idx = np.array(idx)
+        merged = efc._merge_bins(array, idx)
+        np.testing.assert_allclose(merged, _merge_loop(array, idx))
+        assert merged.sum() == pytest.approx(array.sum())
+
+
+@pytest.mark.parametrize("target", [0.05, 0.1, 0.3])
+def test_stat_merge_indices_reach_the_target(target):
+    # unweighted, steeply falling spectrum: the tail needs merging, the bulk does not
+    contents = np.floor(5000 * np.exp(-np.linspace(0, 8, 80)))
+    sumw2 = contents.copy()
+    idx = efc._stat_merge_indices(contents, sumw2, target)
+
+    assert idx[0] == 0 and idx[-1] == len(contents)
+    assert np.all(np.diff(idx) > 0)
+    merged = np.add.reduceat(contents, idx[:-1])
+    merged_sumw2 = np.add.reduceat(sumw2, idx[:-1])
+    assert merged.sum() == contents.sum()
+    assert np.all(np.sqrt(merged_sumw2) <= target * merged * (1 + 1e-12))
+
+
+def test_stat_merge_indices_with_an_unreachable_target():
+    contents = np.ones(5)
+    idx = efc._stat_merge_indices(contents, contents.copy(), 0.01)
+    np.testing.assert_array_equal(idx, [0, 5])
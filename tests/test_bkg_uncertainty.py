@@ -0,0 +1,64 @@
+import os, sys
+
+import numpy as np
+import pytest
+
+ROOT = pytest.importorskip("ROOT")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import EventsFillerClass as efc
+
+
+def _assistant():
+    plot = efc.PlottingAssistant(x_title="HT", units="GeV", n_bins=4, x_range=[0, 400])
+    plot.set_verbose_mode(False)
+    for name, values in (("h_ttbar", [50, 150, 150, 250, 350, 350, 350]),
+                         ("h_wjets", [50, 50, 150, 250, 250])):
+        hist = plot.book_histogram(name)
+        plot.fill_from_arrays(hist, np.array(values, dtype=np.float64))
+        plot.append_histogram(hist, is_background=True, show_legend=True, legend_name=name)
+    return plot
+
+
+def test_band_with_lumi_systematics_and_nuisances():
+    plot = _assistant()
+    ttbar = np.array([1.0, 2.0, 1.0, 3.0])
+    wjets = np.array([2.0, 1.0, 2.0, 0.0])
+    jes_up, jes_down = wjets * 1.2, wjets * 0.9
+
+    bkg_total, band, cov = plot.make_bkg_total_with_uncertainty(
+        per_proc_sys_fracs = [np.full(4, 0.1), np.full(4, 0.2)],
+        lumi_frac          = 0.025,
+        nuisances          = {"jes" : [0.05, (jes_up, jes_down)]},
+        return_covariance  = True)
+
+    total = ttbar + wjets
+    jes = 0.05 * ttbar + 0.5 * (jes_up - jes_down)
+    expected = (np.diag(total + (0.1 * ttbar)**2 + (0.2 * wjets)**2)
+                + 0.025**2 * np.outer(total, total)
+                + np.outer(jes, jes))
+    np.testing.assert_allclose(cov, expected)
+
+    assert band.GetN() == 4
+    for i in range(4):
+        assert band.GetPointX(i) == pytest.approx(50 + 100 * i)
+        assert band.GetErrorX(i) == pytest.approx(50)
+        assert band.GetPointY(i) == pytest.approx(total[i])
+        assert band.GetErrorY(i) == pytest.approx(np.sqrt(expected[i, i]))
+        assert bkg_total.GetBinError(i + 1) == pytest.approx(np.sqrt(expected[i, i]))
+
+
+def test_drawn_band_uses_the_stored_uncertainties(tmp_path):
+    plot = _assistant()
+    uncertainties = {"lumi_frac" : 0.025, "nuisances" : {"jes" : {"h_wjets" : 0.1}}}
+    _, _, cov = plot.make_bkg_total_with_uncertainty(return_covariance=True, **uncertainties)
+
+    plot.set_uncertainties(**uncertainties)
+    plot.draw_plot(str(tmp_path / "plot"), ["png"])
+    band = plot._render_cache["total_errors"]
+    for i in range(4):
+        assert band.GetErrorY(i) == pytest.approx(np.sqrt(cov[i, i]))
+    np.testing.assert_allclose(plot.compute_plot_data()["bkg_covariance"], cov)
+
+    with pytest.raises(TypeError):
+        plot.set_uncertainties(lumi=0.02)
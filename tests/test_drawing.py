@@ -0,0 +1,25 @@
+import os, sys
+
+import numpy as np
+import pytest
+
+ROOT = pytest.importorskip("ROOT")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import EventsFillerClass as efc
+
+
+def test_style_changes_after_the_first_draw_reach_weighted_clones(tmp_path):
+    plot = efc.PlottingAssistant(x_title="HT", units="GeV", n_bins=4, x_range=[0, 400])
+    plot.set_verbose_mode(False)
+    hist = plot.book_histogram("h_ttbar")
+    plot.fill_from_arrays(hist, np.array([50.0, 150.0, 150.0, 350.0]))
+    plot.append_histogram(hist, weight=2.0, is_background=True, show_legend=True, legend_name="ttbar")
+
+    plot.draw_plot(str(tmp_path / "first"), ["png"])
+    plot.design_histogram(hist, line_color=632, fill_color=600, fill_style=3004)
+    plot.draw_plot(str(tmp_path / "second"), ["png"])
+
+    drawn = plot._render_cache["scaled"][id(hist)]
+    assert drawn is not hist
+    assert (drawn.GetLineColor(), drawn.GetFillColor(), drawn.GetFillStyle()) == (632, 600, 3004)
@@ -0,0 +1,70 @@
+import os, sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import EventsFillerClass as efc
+
+
+def _put(cache, key, n_bins = 100):
+    contents = np.arange(n_bins + 2, dtype = np.float64)
+    cache.put(key, contents, 2 * contents, float(n_bins))
+
+
+def _age(cache, key, mtime):
+    os.utime(cache._path(key), (mtime, mtime))
+
+
+def _keys(cache):
+    return sorted(name[:-4] for name in os.listdir(cache.directory) if name.endswith(".npz"))
+
+
+def test_round_trip_and_miss(tmp_path):
+    cache = efc.HistogramCache(str(tmp_path))
+    _put(cache, "a", n_bins = 5)
+    entry = cache.get("a")
+    np.testing.assert_array_equal(entry["contents"], np.arange(7))
+    np.testing.assert_array_equal(entry["sumw2"], 2 * np.arange(7))
+    assert entry["entries"] == 5.0
+    assert cache.get("missing") is None
+
+
+def test_lru_eviction(tmp_path):
+    cache = efc.HistogramCache(str(tmp_path))
+    for idx, key in enumerate(("a", "b", "c")):
+        _put(cache, key)
+        _age(cache, key, 1000 + idx)
+    size = os.path.getsize(cache._path("a"))
+
+    # reading 'a' makes it the most recently used, so 'b' goes first
+    assert cache.get("a") is not None
+    cache.max_bytes = 3 * size + size // 2
+    _put(cache, "d")
+    assert _keys(cache) == ["a", "c", "d"]
+
+
+def test_eviction_keeps_the_entry_just_written(tmp_path):
+    cache = efc.HistogramCache(str(tmp_path))
+    _put(cache, "a")
+    _age(cache, "a", 1000)
+    # larger than the whole cache on its own: written anyway, everything else evicted
+    cache.max_bytes = 1
+    _put(cache, "b")
+    assert _keys(cache) == ["b"]
+    assert cache.get("b") is not None
+
+    cache.clear()
+    assert _keys(cache) == []
+
+
+def test_key_follows_the_input_file(tmp_path):
+    path = tmp_path / "events.root"
+    path.write_bytes(b"x" * 16)
+    cache = efc.HistogramCache(str(tmp_path / "cache"), checksum = True)
+    args = ("tree", "HT", "HT > 100", "w", [50, 0, 1000])
+    key = cache.key(str(path), *args)
+    assert key == cache.key(str(path), *args)
+    assert key != cache.key(str(path), "tree", "HT", "HT > 200", "w", [50, 0, 1000])
+
+    path.write_bytes(b"y" * 32)
+    assert key != efc.HistogramCache(str(tmp_path / "cache"), checksum = True).key(str(path), *args)
@@ -0,0 +1,25 @@
+import os, sys
+
+import pytest
+
+ROOT = pytest.importorskip("ROOT")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import EventsFillerClass as efc
+
+
+def test_default_names_are_unique_per_assistant():
+    plot = efc.PlottingAssistant(x_title="HT", units="GeV", n_bins=4, x_range=[0, 400])
+    other = efc.PlottingAssistant(x_title="HT", units="GeV", n_bins=4, x_range=[0, 400])
+    plot.set_verbose_mode(False)
+    other.set_verbose_mode(False)
+
+    # one plan per process, as fill_from_file() does
+    names = []
+    for sample in ("ttbar.root", "wjets.root"):
+        plan = efc.FillPlan(sample, "Events")
+        plan.add(plot, "HT")
+        plan.add(other, "HT")
+        names.extend(entry["hist_name"] for entry in plan.entries)
+
+    assert len(set(names)) == len(names)
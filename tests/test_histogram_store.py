@@ -0,0 +1,61 @@
+import os, sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import EventsFillerClass as efc
+
+
+def _entry(name, n_bins, role = "background", weight = 1.0):
+    contents = np.arange(n_bins + 2, dtype = np.float64)
+    return {"name" : name, "contents" : contents, "sumw2" : 2 * contents,
+            "edges" : np.linspace(0, 400, n_bins + 1), "title" : f"{name}; HT; Events",
+            "role" : role, "weight" : weight, "legend" : name, "entries" : 10.0 * n_bins}
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "h.store")
+    entries = [_entry("h_ttbar", 4, weight = 0.5), _entry("h_signal", 7, role = "signal"), _entry("h_empty", 1)]
+    efc.HistogramStore.write(path, entries)
+
+    store = efc.HistogramStore(path)
+    assert store.names() == ["h_ttbar", "h_signal", "h_empty"]
+    assert len(store) == 3 and "h_signal" in store and "h_data" not in store
+    for expected in entries:
+        entry = store[expected["name"]]
+        for key in ("contents", "sumw2", "edges"):
+            np.testing.assert_array_equal(entry[key], expected[key])
+            assert not entry[key].flags.writeable
+        for key in ("title", "role", "weight", "legend", "entries"):
+            assert entry[key] == expected[key]
+
+
+def test_data_is_aligned_and_names_are_unique(tmp_path):
+    path = str(tmp_path / "h.store")
+    efc.HistogramStore.write(path, [_entry("h_a", 3)])
+    with open(path, "rb") as f:
+        assert f.read(8) == efc.HistogramStore.MAGIC
+        header_size = int.from_bytes(f.read(8), "little")
+    assert efc.HistogramStore._data_offset(header_size) % efc.HistogramStore.ALIGN == 0
+
+    with pytest.raises(ValueError):
+        efc.HistogramStore.write(str(tmp_path / "dup.store"), [_entry("h_a", 3), _entry("h_a", 3)])
+    with open(str(tmp_path / "bad.store"), "wb") as f:
+        f.write(b"NOTASTORE" * 4)
+    with pytest.raises(ValueError):
+        efc.HistogramStore(str(tmp_path / "bad.store"))
+
+
+def test_attach_rejects_a_different_binning(tmp_path):
+    pytest.importorskip("ROOT")
+    path = str(tmp_path / "h.store")
+    efc.HistogramStore.write(path, [_entry("h_ttbar", 4), _entry("h_signal", 8, role = "signal")])
+
+    plot = efc.PlottingAssistant(x_title="HT", units="GeV", n_bins=4, x_range=[0, 400], log_level=efc.Log.OFF)
+    with pytest.raises(ValueError):
+        plot.attach_store(path)
+    assert plot.histograms == []
+
+    attached = plot.attach_store(path, names = ["h_ttbar"])
+    assert [hist.GetName() for hist in attached] == ["h_ttbar"]
@@ -0,0 +1,114 @@
+import json, os, sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import EventsFillerClass as efc
+
+
+def _manifest():
+    return {
+        "output_dir" : "plots",
+        "formats"    : ["pdf", "png"],
+        "samples"    : {
+            "ttbar"  : {"files" : "ttbar.root", "weight" : "w", "cut" : "nJet > 3"},
+            "signal" : {"files" : ["signal.root"], "role" : "signal", "legend" : "S"}
+        },
+        "plots"      : [
+            {"name" : "ht",      "expression" : "HT", "samples" : ["ttbar", "signal"], "x_range" : [0, 1000]},
+            {"name" : "ht_logy", "expression" : "HT", "samples" : ["ttbar", "signal"], "x_range" : [0, 1000],
+             "logy" : True},
+            {"name" : "met",     "expression" : "MET", "samples" : ["ttbar"], "n_bins" : 10, "x_range" : [0, 500],
+             "cut" : "HT > 100"}
+        ]
+    }
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    for name in ("ttbar.root", "signal.root"):
+        (tmp_path / name).write_bytes(b"events")
+    return tmp_path
+
+
+def test_load_manifest_checks(tmp_path):
+    path = str(tmp_path / "plots.json")
+    with open(path, "w") as f:
+        json.dump(_manifest(), f)
+    assert efc.load_manifest(path)["plots"][0]["name"] == "ht"
+
+    for broken in (
+        lambda m: m["plots"][0].pop("expression"),
+        lambda m: m["plots"][0].pop("x_range"),
+        lambda m: m["plots"][0]["samples"].append("data"),
+        lambda m: m["plots"][1].update(name = "ht"),
+        lambda m: m["samples"]["ttbar"].pop("files"),
+    ):
+        manifest = _manifest()
+        broken(manifest)
+        with open(path, "w") as f:
+            json.dump(manifest, f)
+        with pytest.raises(ValueError):
+            efc.load_manifest(path)
+
+
+def test_graph_shares_fills_between_plots(inputs):
+    graph = efc.build_manifest_graph(_manifest(), str(inputs))
+    plots, histograms = graph["plots"], graph["histograms"]
+
+    # 'ht' and 'ht_logy' fill the same histograms and differ only in plot settings
+    assert plots["ht"]["histograms"] == plots["ht_logy"]["histograms"]
+    assert plots["ht"]["hash"] != plots["ht_logy"]["hash"]
+    assert len(histograms) == 3
+
+    met = histograms[plots["met"]["histograms"][0]]
+    assert met["cut"] == "(HT > 100) && (nJet > 3)"
+    assert met["weight"] == "w" and met["tree"] == "Events" and met["binning"] == [10, 0.0, 500.0]
+    assert met["files"] == [os.path.join(str(inputs), "ttbar.root")]
+
+
+def test_graph_hashes_follow_the_inputs(inputs):
+    before = efc.build_manifest_graph(_manifest(), str(inputs))
+    os.utime(inputs / "signal.root", ns = (0, 10**9))
+    after = efc.build_manifest_graph(_manifest(), str(inputs))
+
+    # same fills, new input identity: only what reads signal.root changes
+    assert before["histograms"].keys() == after["histograms"].keys()
+    assert before["plots"]["met"]["hash"] == after["plots"]["met"]["hash"]
+    assert before["plots"]["ht"]["hash"] != after["plots"]["ht"]["hash"]
+
+    with pytest.raises(FileNotFoundError):
+        efc.build_manifest_graph(_manifest(), str(inputs / "elsewhere"))
+
+
+def _up_to_date(inputs, manifest, names):
+    """Writes the outputs and the state run_manifest() leaves behind for 'names'."""
+    graph = efc.build_manifest_graph(manifest, str(inputs))
+    output_dir = inputs / "plots"
+    output_dir.mkdir(exist_ok = True)
+    for name in names:
+        for fmt in manifest["formats"]:
+            (output_dir / f"{name}.{fmt}").write_bytes(b"plot")
+    with open(output_dir / ".plotting_assistant_state.json", "w") as f:
+        json.dump({name : graph["plots"][name]["hash"] for name in names}, f)
+
+
+def test_run_manifest_rebuilds_only_stale_plots(inputs):
+    manifest = _manifest()
+    summary = efc.run_manifest(manifest, str(inputs), dry_run = True)
+    assert summary["up_to_date"] == [] and summary["rebuilt"] == []
+
+    _up_to_date(inputs, manifest, ["ht", "ht_logy", "met"])
+    summary = efc.run_manifest(manifest, str(inputs), dry_run = True)
+    assert summary["up_to_date"] == ["ht", "ht_logy", "met"]
+
+    assert efc.run_manifest(manifest, str(inputs), dry_run = True, force = True)["up_to_date"] == []
+    assert efc.run_manifest(manifest, str(inputs), dry_run = True, only = ["met"])["up_to_date"] == ["met"]
+
+    # a missing output, a changed plot setting and a rewritten input each make plots stale
+    os.remove(inputs / "plots" / "ht_logy.png")
+    assert efc.run_manifest(manifest, str(inputs), dry_run = True)["up_to_date"] == ["ht", "met"]
+    manifest["plots"][2]["n_bins"] = 20
+    assert efc.run_manifest(manifest, str(inputs), dry_run = True)["up_to_date"] == ["ht"]
+    (inputs / "signal.root").write_bytes(b"more events")
+    assert efc.run_manifest(manifest, str(inputs), dry_run = True)["up_to_date"] == []
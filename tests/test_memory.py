@@ -0,0 +1,40 @@
+import gc, os, sys
+
+import numpy as np
+import pytest
+
+ROOT = pytest.importorskip("ROOT")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import EventsFillerClass as efc
+
+
+def _plot(idx, pool, rng, out_dir):
+    plot = efc.PlottingAssistant(x_title="HT", units="GeV", n_bins=50, x_range=[0, 1000],
+                                 graphics_pool=pool, log_level=efc.Log.OFF)
+    for p in range(3):
+        hist = plot.book_histogram(f"h_mem_{idx}_{p}")
+        plot.fill_from_arrays(hist, rng.exponential(150 + 20 * p, 1000), rng.normal(1.0, 0.1, 1000))
+        plot.append_histogram(hist, is_background=True, show_legend=True, legend_name=f"bkg {p}")
+    hist = plot.book_histogram(f"h_mem_{idx}_sig")
+    plot.fill_from_arrays(hist, rng.normal(400, 50, 100))
+    plot.append_histogram(hist, is_signal=True, show_legend=True, legend_name="signal")
+    plot.draw_plot(os.path.join(out_dir, "plot"), ["png"])
+    plot.clean_memory()
+
+
+def test_memory_stays_flat_over_many_plots(tmp_path):
+    """Same check as bench_plotting_assistant.py --pool --no-profile --max-growth-mb 5, on fewer plots."""
+    rng = np.random.default_rng(1234)
+    pool = efc.GraphicsPool()
+    for idx in range(50):       # warm-up: ROOT, style, pooled canvas
+        _plot(idx, pool, rng, str(tmp_path))
+    gc.collect()
+
+    rss = []
+    for idx in range(50, 450):
+        _plot(idx, pool, rng, str(tmp_path))
+        if idx % 10 == 0:
+            rss.append(efc._current_rss_kb() / 1024)
+    growth_per_1000 = np.polyfit(np.arange(len(rss)) * 10, rss, 1)[0] * 1000
+    assert growth_per_1000 < 5.0, f"RSS grows by {growth_per_1000:.2f} MB / 1000 plots"
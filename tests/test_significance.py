@@ -0,0 +1,65 @@
+import os, sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import EventsFillerClass as efc
+
+
+def test_cut_sums_match_a_loop():
+    rng = np.random.default_rng(3)
+    cells = rng.exponential(2.0, 10 + 2)          # underflow, 10 bins, overflow
+    lower, upper, window = efc._cut_sums(cells)
+    n_edges = len(cells) - 1
+    assert lower.shape == upper.shape == (n_edges,) and window.shape == (n_edges, n_edges)
+    for k in range(n_edges):
+        # edge k separates cells[:k+1] (below) from cells[k+1:] (above)
+        assert upper[k] == pytest.approx(cells[:k+1].sum())
+        assert lower[k] == pytest.approx(cells[k+1:].sum())
+        for j in range(n_edges):
+            if j <= k:
+                assert np.isnan(window[k, j])
+            else:
+                assert window[k, j] == pytest.approx(cells[k+1:j+1].sum())
+
+
+def test_asimov_z():
+    s, b = np.array([10.0, 0.0, 5.0, 1e-3]), np.array([100.0, 50.0, 0.0, 1e4])
+    z = efc._asimov_z(s, b)
+    assert z[0] == pytest.approx(np.sqrt(2 * (110 * np.log(1.1) - 10)))
+    assert z[1] == 0.0
+    assert np.isnan(z[2])
+    # s << b: the Asimov significance tends to s / sqrt(b)
+    assert z[3] == pytest.approx(1e-3 / 100, rel=1e-4)
+
+
+def test_asimov_z_with_background_uncertainty():
+    s, b = np.array([10.0]), np.array([100.0])
+    z = efc._asimov_z(s, b)
+    assert efc._asimov_z(s, b, 1e-6) == pytest.approx(z, rel=1e-4)
+    z_sys = efc._asimov_z(s, b, 0.2)
+    assert 0 < z_sys[0] < z[0]
+    # s << b: tends to s / sqrt(b + (sigma b)^2)
+    s_small = np.array([1e-3])
+    assert efc._asimov_z(s_small, b, 0.2) == pytest.approx(1e-3 / np.sqrt(100 + 20**2), rel=1e-3)
+
+
+def test_significance_errors():
+    s, s_var = np.array([10.0, 4.0]), np.array([2.0, 0.5])
+    b, b_var = np.array([100.0, 0.0]), np.array([9.0, 1.0])
+    scan = efc._significances(s, s_var, b, b_var)
+
+    np.testing.assert_allclose(scan["s_err"], np.sqrt(s_var))
+    np.testing.assert_allclose(scan["b_err"], np.sqrt(b_var))
+    assert scan["s_over_sqrt_b"][0] == pytest.approx(1.0)
+    # dS/sqrt(B) = sqrt( var_s / B + S^2 var_b / (4 B^3) )
+    assert scan["s_over_sqrt_b_err"][0] == pytest.approx(np.sqrt(2.0 / 100 + 100 * 9.0 / (4 * 100**3)))
+    assert np.isnan(scan["s_over_sqrt_b"][1]) and np.isnan(scan["s_over_sqrt_b_err"][1])
+
+    # Asimov error against the analytic derivatives of Z^2 = 2((s+b) ln(1+s/b) - s)
+    z = scan["z_asimov"][0]
+    dz_ds = np.log1p(10 / 100) / z
+    dz_db = (np.log1p(10 / 100) - 10 / 100) / z
+    expected = np.sqrt(dz_ds**2 * 2.0 + dz_db**2 * 9.0)
+    assert scan["z_asimov_err"][0] == pytest.approx(expected, rel=1e-5)